@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare pending event stores, with thousands of pending modulation events:
+heapify after every batch, one heap insertion per event, and EventQueue.
+
+Every tick, a batch of CC ramp messages is pushed and due events are popped.
+Memory used by a dense CC stream is measured as well.
+
+Usage:
+    python benchmarks/bench_eventqueue.py [batch_size] [num_batches]
+"""
+
+import sys
+import time
+import heapq
+import random
+import tracemalloc
+
+from midiseq.eventqueue import EventQueue
+
+
+LOOKAHEAD = 4.0 # Batches are rendered up to 4 units ahead
+TICK = 0.01
+
+
+def make_batches(batch_size: int, num_batches: int):
+    rnd = random.Random(0)
+    batches = []
+    for i in range(num_batches):
+        start = i * TICK + LOOKAHEAD * rnd.random()
+        batch = [ (start + j * 0.01, [0xB0, 1, j & 0x7f]) for j in range(batch_size) ]
+        rnd.shuffle(batch) # Rendered messages aren't sorted
+        batches.append(batch)
+    return batches
+
+
+def run_heapify(batches):
+    events = []
+    for i, batch in enumerate(batches):
+        events.extend(batch)
+        heapq.heapify(events)
+        now = i * TICK
+        while events and events[0][0] <= now:
+            heapq.heappop(events)
+    return len(events)
+
+
+def run_heappush(batches):
+    events = []
+    for i, batch in enumerate(batches):
+        for e in batch:
+            heapq.heappush(events, e)
+        now = i * TICK
+        while events and events[0][0] <= now:
+            heapq.heappop(events)
+    return len(events)
+
+
+def run_eventqueue(batches):
+    events = EventQueue()
+    for i, batch in enumerate(batches):
+        events.pushMany(batch)
+        for _ in events.popUntil(i * TICK):
+            pass
+    return len(events)
+
+
+def measure_memory(num_events: int):
+    """Memory used by pending CC events, in bytes per event"""
+    results = dict()
+
+    tracemalloc.start()
+    heap = []
+    for i in range(num_events):
+        heapq.heappush(heap, (i * 0.001, [0xB0, 1, i & 0x7f]))
+    results["heappush"] = tracemalloc.get_traced_memory()[0] / num_events
+    tracemalloc.stop()
+    del heap
+
+    tracemalloc.start()
+    queue = EventQueue()
+    for i in range(num_events):
+        queue.push(i * 0.001, [0xB0, 1, i & 0x7f])
+    results["EventQueue"] = tracemalloc.get_traced_memory()[0] / num_events
+    tracemalloc.stop()
+    return results
+
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    num_batches = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    batches = make_batches(batch_size, num_batches)
+
+    print(f"{num_batches} batches of {batch_size} events")
+    results = set()
+    for name, run in [
+            ("heapify", run_heapify),
+            ("heappush", run_heappush),
+            ("EventQueue", run_eventqueue),
+        ]:
+        t = time.perf_counter()
+        results.add(run([ list(b) for b in batches ]))
+        elapsed = time.perf_counter() - t
+        print(f"{name:>12}: {elapsed * 1000:8.1f} ms, {elapsed / num_batches * 1e6:6.1f} us per batch")
+    assert len(results) == 1, "Pending event counts differ"
+
+    num_events = 100000
+    print(f"Memory, {num_events} pending CC events")
+    for name, size in measure_memory(num_events).items():
+        print(f"{name:>12}: {size:6.1f} bytes per event")
@@ -0,0 +1,54 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure the time taken by 'import midiseq' in a fresh interpreter,
+and check that importing has no side effects (no output, no opened port).
+
+Exits with an error when the median import time is over the limit,
+so it can guard startup time.
+
+Usage:
+    python benchmarks/bench_import.py [num_runs] [max_ms]
+"""
+
+import sys
+import subprocess
+import statistics
+
+
+SCRIPT = """
+import time
+t = time.perf_counter()
+import midiseq
+elapsed = time.perf_counter() - t
+import midiseq.engine
+assert not midiseq.engine._midiout_ports, "Ports were opened on import"
+assert "seq_freya_theme" not in vars(midiseq.seqs), "Example sequences were built on import"
+print(elapsed)
+"""
+
+
+def measure(num_runs: int):
+    times = []
+    for _ in range(num_runs):
+        result = subprocess.run(
+            [sys.executable, "-c", SCRIPT],
+            capture_output=True, text=True, check=True
+        )
+        lines = result.stdout.split()
+        assert len(lines) == 1, f"Import printed to stdout: {result.stdout!r}"
+        times.append(float(lines[0]))
+    return times
+
+
+if __name__ == "__main__":
+    num_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 250.0
+
+    times = measure(num_runs)
+    median = statistics.median(times) * 1000
+    print(f"import midiseq, {num_runs} runs: median {median:.1f} ms, min {min(times) * 1000:.1f} ms")
+    if median > max_ms:
+        print(f"Import is slower than {max_ms:.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare scheduled and actual send times of MIDI messages,
+with the fixed 'time_res' polling loop and with the deadline-driven scheduler.
+
+Usage:
+    python benchmarks/bench_scheduler.py [num_notes] [backend]
+
+With the "null" or "capture" backend, no MIDI device is needed
+and the kernel MIDI overhead isn't measured.
+"""
+
+import sys
+import time
+
+from rtmidi.midiconstants import NOTE_ON
+
+from midiseq import *
+import midiseq.engine as engine
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def measure(port, num_notes: int, deadline_scheduling: bool):
+    engine.deadline_scheduling = deadline_scheduling
+    sent = []
+    send_message = port.port.send_message
+
+    def send_and_log(message):
+        sent.append((time.perf_counter(), list(message)))
+        send_message(message)
+    port.port.send_message = send_and_log
+
+    track = Track(name="bench")
+    track.port = port
+    setNoteDur(1/16)
+    seq = Seq("c") * num_notes
+    track.add(seq)
+    tracks.add_track(track)
+
+    play(track)
+    track_dur = seq.dur * 120 / env.bpm
+    time.sleep(track_dur + 0.5)
+    stop()
+    port.port.send_message = send_message
+    tracks.tracks.discard(track)
+    tracks._update_priority_list()
+
+    onsets = [ t for t, mess in sent if mess[0] & 0xf0 == NOTE_ON ]
+    interval = env.note_dur * 120 / env.bpm
+    # Scheduled times are anchored on the first onset
+    errors = [ abs(t - (onsets[0] + i * interval)) * 1000 for i, t in enumerate(onsets) ]
+    return errors
+
+
+def idle_cpu(deadline_scheduling: bool, dur=2.0) -> float:
+    engine.deadline_scheduling = deadline_scheduling
+    t0, c0 = time.perf_counter(), time.process_time()
+    time.sleep(dur)
+    return 100 * (time.process_time() - c0) / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    num_notes = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    if len(sys.argv) > 2:
+        engine.setBackend(sys.argv[2])
+    port = env.default_output
+    if port is None:
+        print("No output port available")
+        sys.exit(1)
+
+    engine.start_io()
+    for deadline in (False, True):
+        name = "deadline" if deadline else f"polling ({engine.time_res*1000:.0f} ms)"
+        errors = measure(port, num_notes, deadline)
+        print(f"{name:16}  onset error (ms)  "
+              f"p50={percentile(errors, 0.5):.3f}  "
+              f"p99={percentile(errors, 0.99):.3f}  "
+              f"max={max(errors):.3f}  "
+              f"idle cpu={idle_cpu(deadline):.1f}%")
+    engine.stop_io()
@@ -25,7 +25,8 @@ from .definitions import *
 from .engine import (
     listOutputs, getOutput, getOutputs,
     listInputs, getInput, getInputs,
-    play, stop, panic
+    play, stop, panic,
+    render, getPosition,
 )
 from .tracks import Track, TrackGroup, tracks
 
@@ -45,6 +46,7 @@ from .utils import (
 # from .whistle import whistle, whistleDur, tap, tapDur
 from .generators import *
 from .seqs import *
+from . import seqs as _seqs
 import midiseq.env as env
 
 ###### Generative Neural Network #######
@@ -58,8 +60,8 @@ def setNoteDur(d):
 def setScale(scale="chromatic", tonic="c"):
     env.scale = Scl(scale, tonic)
 
-def setBpm(bpm):
-    env.bpm = bpm
+def setBpm(bpm, at=None, ramp=0.0):
+    engine.setBpm(bpm, at, ramp)
 
 def clearAll():
     for track in tracks:
@@ -67,15 +69,18 @@ def clearAll():
 
 def mute(*tracks) -> None:
     for t in tracks:
-        t.muted = True
+        t.mute()
 
 def unmute(*tracks) -> None:
     for t in tracks:
-        t.muted = False
+        t.unmute()
 
 def mutesw(*tracks) -> None:
     for t in tracks:
-        t.muted = not t.muted
+        if t.muted:
+            t.unmute()
+        else:
+            t.mute()
 
 
 env.METRONOME_NOTES = (36, 38)
@@ -83,30 +88,9 @@ env.METRONOME_NOTES = (36, 38)
 setScale("major", "c")
 
 
-midi_out = dict()
-midi_out["default"] = getOutput(0)
-for port_idx, port_name in getOutputs():
-    if "microfreak" in port_name.lower():
-        midi_out["microfreak"] = getOutput(port_idx)
-    if "fluid" in port_name.lower():
-        midi_out["fluidsynth"] = getOutput(port_idx)
-    if "amsynth" in port_name.lower():
-        midi_out["amsynth"] = getOutput(port_idx)
-    if "preenfm" in port_name.lower():
-        midi_out["preenfm"] = getOutput(port_idx)
-    if "irig" in port_name.lower():
-        midi_out["irig"] = getOutput(port_idx)
-
-env.default_output = midi_out["default"]
-_metronome_port = midi_out["default"]
-
-# Prefered output ports
-if "microfreak" in midi_out:
-    env.default_output = midi_out["microfreak"]
-elif "fluidsynth" in midi_out:
-    env.default_output = midi_out["fluidsynth"]
-elif "irig" in midi_out:
-    env.default_output = midi_out["irig"]
+# Output ports are opened on first use (see 'engine.defaultOutputs'),
+# 'env.default_output' is the preferred one
+midi_out = engine.LazyOutputs()
 
 
 t1 = Track(0, name="t1")
@@ -264,4 +248,15 @@ def stop8():
 
 
 def display(status=True):
-    env.display_notes = status
\ No newline at end of file
+    env.display_notes = status
+
+
+def __getattr__(name):
+    # Example sequences are built on first access (see 'seqs')
+    if name in _seqs._examples:
+        return getattr(_seqs, name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+# Star imports bind example sequences as well (they are built then)
+__all__ = [ name for name in globals() if not name.startswith("_") ] + list(_seqs._examples)
@@ -0,0 +1,197 @@
+from typing import Optional, Callable, List, Tuple, Union, Any
+from collections import deque
+import time
+
+
+
+# Ports follow the subset of rtmidi's MidiOut and MidiIn interfaces used by the engine,
+# so rtmidi ports are used as they are
+
+
+class NullOutput:
+    """Output port sending nowhere, only counts messages and bytes"""
+
+    def __init__(self, name: str = "null") -> None:
+        self.name = name
+        self.messages = 0
+        self.bytes = 0
+        self._open = True
+
+
+    def send_message(self, message) -> None:
+        self.messages += 1
+        self.bytes += len(message)
+
+
+    def is_port_open(self) -> bool:
+        return self._open
+
+
+    def close_port(self) -> None:
+        self._open = False
+
+
+
+class CaptureOutput(NullOutput):
+    """
+    Output port keeping sent messages in memory, with their sending time
+
+    Args:
+        timer: Function returning the current time, in seconds
+        capacity (int): Number of messages kept (oldest are dropped), unlimited if None
+    """
+
+    def __init__(
+            self,
+            name: str = "capture",
+            timer: Callable[[], float] = time.perf_counter,
+            capacity: Optional[int] = None
+        ) -> None:
+        super().__init__(name)
+        self.timer = timer
+        self.sent = deque(maxlen=capacity) # (time, message)
+
+
+    def send_message(self, message) -> None:
+        self.messages += 1
+        self.bytes += len(message)
+        self.sent.append( (self.timer(), list(message)) )
+
+
+
+class FileOutput(NullOutput):
+    """
+    Output port writing raw MIDI bytes to a file (or to a raw MIDI device node),
+    without running status
+
+    Args:
+        path (str): File to write to, truncated when opened
+        buffering (int): Write buffer size, in bytes (0 to write every message right away)
+    """
+
+    def __init__(self, path: str, buffering: int = 4096) -> None:
+        super().__init__(path)
+        self._file = open(path, "wb", buffering=buffering)
+
+
+    def send_message(self, message) -> None:
+        self.messages += 1
+        self.bytes += len(message)
+        self._file.write(bytes(message))
+
+
+    def close_port(self) -> None:
+        if self._open:
+            self._file.close()
+        self._open = False
+
+
+
+class QueueInput:
+    """
+    Input port receiving messages given to 'feed', from any thread
+    (a null input when nothing is fed).
+    Messages aren't copied, they must not be modified afterwards.
+    """
+
+    def __init__(self, name: str = "queue", timer: Callable[[], float] = time.perf_counter) -> None:
+        self.name = name
+        self.timer = timer
+        self._queue = deque() # (message, time delta), when polled
+        self._callback: Optional[Callable] = None
+        self._data = None
+        self._last: Optional[float] = None # Time of last message
+        self._open = True
+
+
+    def feed(self, message) -> None:
+        """Receive a message now"""
+        now = self.timer()
+        delta = 0.0 if self._last is None else now - self._last
+        self._last = now
+        callback = self._callback
+        if callback is not None:
+            callback( (message, delta), self._data )
+        else:
+            self._queue.append( (message, delta) )
+
+
+    def set_callback(self, func: Callable, data=None) -> None:
+        self._data = data
+        self._callback = func
+
+
+    def cancel_callback(self) -> None:
+        self._callback = None
+
+
+    def get_message(self) -> Optional[Tuple[List[int], float]]:
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+
+    def ignore_types(self, sysex=True, timing=True, active_sense=True) -> None:
+        pass
+
+
+    def is_port_open(self) -> bool:
+        return self._open
+
+
+    def close_port(self) -> None:
+        self._open = False
+        self._callback = None
+
+
+
+def openOutput(backend: str, port_id: Union[int, str]) -> Tuple[Any, str]:
+    """
+    Open an output port with a given backend
+
+    Args:
+        backend (str): "rtmidi", "null", "capture", "file" (port_id is the file path)
+            or "bus" (port_id is the name of an in-process bus, see 'bus.getBus')
+        port_id (int | str): Port number or name
+
+    Returns:
+        (port, port name)
+    """
+    if backend == "rtmidi":
+        from rtmidi.midiutil import open_midioutput
+        return open_midioutput(port_id)
+    name = str(port_id)
+    if backend == "null":
+        return NullOutput(name), name
+    if backend == "capture":
+        return CaptureOutput(name), name
+    if backend == "file":
+        return FileOutput(name), name
+    if backend == "bus":
+        from .bus import getBus
+        return getBus(name), name
+    raise ValueError(f"Unknown output backend '{backend}'")
+
+
+def openInput(backend: str, port_id: Union[int, str]) -> Tuple[Any, str]:
+    """
+    Open an input port with a given backend
+
+    Args:
+        backend (str): "rtmidi", "bus" (receives messages sent to the in-process bus named 'port_id')
+            or "null" (a 'QueueInput', only receiving fed messages)
+        port_id (int | str): Port number or name
+
+    Returns:
+        (port, port name)
+    """
+    if backend == "rtmidi":
+        from rtmidi.midiutil import open_midiinput
+        return open_midiinput(port_id)
+    name = str(port_id)
+    if backend == "bus":
+        from .bus import BusInput, getBus
+        return BusInput(getBus(name)), name
+    if backend in ("null", "capture", "file"):
+        return QueueInput(name), name
+    raise ValueError(f"Unknown input backend '{backend}'")
@@ -0,0 +1,120 @@
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+
+from .backends import QueueInput
+
+
+
+class MidiBus:
+    """
+    In-process MIDI routing: messages sent to a bus are delivered right away
+    to every subscriber, from the sending thread, without going through the OS.
+
+    Messages aren't copied, subscribers must not modify them.
+    A bus can be used as an output port backend (see 'backends.openOutput'),
+    subscribers can be virtual input ports ('BusInput'), recorders
+    ('backends.CaptureOutput.send_message'), transformers ('Transform')
+    or any function taking a midi message.
+
+    Args:
+        name (str): Name of the bus
+    """
+
+    def __init__(self, name: str = "bus") -> None:
+        self.name = name
+        # Replaced on change, so messages can be sent while subscribers change
+        self._subscribers: Tuple[Callable, ...] = ()
+        self._lock = threading.Lock()
+        self.messages = 0 # Number of messages sent to the bus
+
+
+    def subscribe(self, consumer: Callable[[list], None]) -> Callable[[list], None]:
+        """Deliver messages sent to the bus to 'consumer', returns the consumer"""
+        with self._lock:
+            self._subscribers = self._subscribers + (consumer,)
+        return consumer
+
+
+    def unsubscribe(self, consumer: Callable[[list], None]) -> None:
+        with self._lock:
+            self._subscribers = tuple(c for c in self._subscribers if c != consumer)
+
+
+    def send_message(self, message) -> None:
+        self.messages += 1
+        for consumer in self._subscribers:
+            consumer(message)
+
+
+    def is_port_open(self) -> bool:
+        return True
+
+
+    def close_port(self) -> None:
+        """A bus stays open, other ports may still send to it"""
+        pass
+
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+
+class BusInput(QueueInput):
+    """
+    Virtual input port, receiving the messages sent to a bus
+
+    Args:
+        bus (MidiBus): Bus to subscribe to
+        timer: Function returning the current time, in seconds
+    """
+
+    def __init__(self, bus: MidiBus, timer: Callable[[], float] = time.perf_counter) -> None:
+        super().__init__(bus.name, timer)
+        self.bus = bus
+        bus.subscribe(self.feed)
+
+
+    def close_port(self) -> None:
+        self.bus.unsubscribe(self.feed)
+        super().close_port()
+
+
+
+class Transform:
+    """
+    Bus subscriber applying a function to messages,
+    and sending the results to a target (a bus, an output port or a function)
+
+    Args:
+        func: Function returning a new message, or None to drop the message
+        target: Object with a 'send_message' or a 'send' method, or a function
+    """
+
+    def __init__(self, func: Callable[[list], Optional[list]], target) -> None:
+        self.func = func
+        if hasattr(target, "send_message"):
+            self._send = target.send_message
+        elif hasattr(target, "send"):
+            self._send = target.send
+        else:
+            self._send = target
+
+
+    def __call__(self, message) -> None:
+        result = self.func(message)
+        if result is not None:
+            self._send(result)
+
+
+
+_buses: Dict[str, MidiBus] = dict()
+
+
+def getBus(name: str) -> MidiBus:
+    """Return the bus with this name, created on first use"""
+    bus = _buses.get(name)
+    if bus is None:
+        bus = _buses.setdefault(name, MidiBus(name))
+    return bus
@@ -0,0 +1,80 @@
+import threading
+import time
+import math
+
+
+
+class Clock:
+    """
+    Monotonic high resolution clock.
+    Time is counted in integer nanoseconds from a single origin,
+    so it doesn't drift however long it runs.
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter_ns()
+
+
+    def now_ns(self) -> int:
+        """Nanoseconds elapsed since origin"""
+        return time.perf_counter_ns() - self.origin
+
+
+    def now(self) -> float:
+        """Seconds elapsed since origin"""
+        return self.now_ns() * 1e-9
+
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0.0:
+            time.sleep(seconds)
+
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """
+        Sleep until 'event' is set or 'timeout' (in seconds) is elapsed.
+        Returns True if the event was set.
+        """
+        return event.wait(timeout)
+
+
+    def reset(self) -> None:
+        """Set origin to current time"""
+        self.origin = time.perf_counter_ns()
+
+
+
+class VirtualClock(Clock):
+    """
+    Deterministic clock, for tests and offline processing.
+    Time only moves forward when 'advance', 'sleep' or 'wait' is called,
+    so sleeping returns immediately.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.origin = 0
+        self._now_ns = math.ceil(start * 1e9)
+
+
+    def now_ns(self) -> int:
+        return self._now_ns
+
+
+    def advance(self, seconds: float) -> None:
+        # Rounded up so that time always moves forward
+        self._now_ns += max(math.ceil(seconds * 1e9), 0)
+
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        return False
+
+
+    def reset(self) -> None:
+        self._now_ns = 0
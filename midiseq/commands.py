@@ -0,0 +1,77 @@
+from typing import NamedTuple, Optional, Any, List, Tuple
+from collections import deque
+import heapq
+import math
+
+
+
+class Command(NamedTuple):
+    at: Optional[float]  # Target engine position, in time units (None to apply as soon as possible)
+    target: Any          # Track to apply the command to, None for engine commands
+    name: str
+    args: Tuple
+
+
+
+class CommandQueue:
+    """
+    Control commands sent to the IO thread.
+
+    Commands are pushed from the REPL, and from other threads
+    (rtmidi's callback thread, for clock slave input ports).
+    There is a single consumer (the IO thread), which drains the queue once per cycle.
+    Neither side needs a lock, as deque appends and pops are atomic,
+    and commands from a given thread keep their order.
+    Commands with a target position are kept aside until they are due.
+    """
+
+    def __init__(self) -> None:
+        self._queue = deque()
+        self._pending: List[tuple] = [] # Heap of (due position, count, command), consumer side only
+        self._count = 0
+        self.running = False # True when the IO thread is draining the queue
+
+
+    def push(self, target, name: str, args: tuple = (), at: Optional[float] = None) -> None:
+        """Producer side"""
+        self._queue.append(Command(at, target, name, args))
+
+
+    def drain(self, position: float, lookahead: float = 0.0) -> List[Command]:
+        """
+        Consumer side, returns due commands in order.
+
+        Args:
+            position: Current engine position, in time units
+            lookahead: Track commands and the engine "play" command are due
+                this long before their target, as tracks are rendered ahead of time
+        """
+        while self._queue:
+            command = self._queue.popleft()
+            if command.at is None:
+                due = -math.inf
+            elif command.target is None and command.name != "play":
+                due = command.at
+            else:
+                due = command.at - lookahead
+            heapq.heappush(self._pending, (due, self._count, command))
+            self._count += 1
+
+        commands = []
+        while self._pending and self._pending[0][0] <= position:
+            commands.append(heapq.heappop(self._pending)[2])
+        return commands
+
+
+    def nextDue(self) -> float:
+        """Consumer side, position of the next pending command"""
+        return self._pending[0][0] if self._pending else math.inf
+
+
+    def clear(self) -> None:
+        self._queue.clear()
+        self._pending.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._queue) + len(self._pending)
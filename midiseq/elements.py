@@ -833,15 +833,18 @@ class Seq(BaseElement):
         return s
     
 
-    def getMidiMessages(self, channel=0) -> List[Tuple[float, list]]:
+    def getMidiMessages(self, channel=0, offset=0.0) -> List[Tuple[float, list]]:
         """Return this sequence as a list of MIDI messages
 
         Parameters:
             channel (int):
                 Midi channel [0-15]
+            offset (float):
+                Added to message times
         """
         messages = []
         for pos, note in self.notes:
+            pos += offset
             # Probability
             if note.prob < 1 and random.random() > note.prob:
                 continue
@@ -1,99 +1,248 @@
-from typing import List, Union, Generator, Optional, Dict
+from typing import List, Union, Generator, Optional, Dict, Iterator, TYPE_CHECKING
 import threading
 import time
-import heapq
+import math
+import gc
+from collections import deque
+from collections.abc import Mapping
 
 import rtmidi
-print(f"Using python-rtmidi V{rtmidi.version.version} and rtmidi V{rtmidi.get_rtmidi_version()}")
-from rtmidi.midiutil import (
-    list_input_ports, list_output_ports,
-    open_midiinput, open_midioutput
-)
+from rtmidi.midiutil import open_midioutput
 from rtmidi.midiconstants import (
     NOTE_ON, NOTE_OFF,
     ALL_SOUND_OFF, RESET_ALL_CONTROLLERS,
     CONTROL_CHANGE,
+    TIMING_CLOCK, SONG_START, SONG_CONTINUE, SONG_STOP,
 )
 
 import midiseq.env as env
 from .elements import Seq, Note, PNote, Chord
-from .tracks import Track, tracks
+from .tracks import Track, TrackGroup, TrackScheduler, tracks
+from .stats import TimingStats
+from .clock import Clock, VirtualClock
+from .ringbuffer import EventRing
+from .eventqueue import EventQueue
+from .keystates import KeyStates, ChannelStates
+from .ratelimit import RateLimiter, DIN_BANDWIDTH
+from .midiclock import MidiClock, ClockFollower, TICK
+from .tempomap import TempoMap
+from .registry import PortRegistry, portKey
+from . import backends
+
+if TYPE_CHECKING:
+    # Imported when started, multiprocessing is slow to import
+    from .remote import RemoteEngine
 
 
 
 
 class InputPort:
-    """An opened input Midi port"""
+    """
+    An opened input Midi port
 
-    def __init__(self, port_id: Union[int, str]) -> None:
-        self.port, self.name = open_midiinput(port_id)
+    Args:
+        port_id (int | str): Port number or name to open
+        backend (str | object):
+            "rtmidi", "null", or a port object following rtmidi's MidiIn interface
+            (defaults to 'engine.port_backend', see 'backends')
+        callback (bool):
+            Handle incoming messages as soon as they arrive, from rtmidi's callback thread,
+            instead of polling them from the IO thread (defaults to 'engine.input_callback')
+        spill (str):
+            Append-only file where events dropped from the ring buffer are saved (optional)
+    """
 
-        # Key state lookup table for every note of every midi channel
-        # each state is a list of onset time and key velocity
-        self._key_states = [ [0.0, 0] for _ in range(16 * 128) ]
+    def __init__(
+            self,
+            port_id: Union[int, str],
+            callback: Optional[bool] = None,
+            spill: Optional[str] = None,
+            backend = None
+        ) -> None:
+        if backend is None or isinstance(backend, str):
+            self.backend: Optional[str] = backend or port_backend
+            self.port, self.name = backends.openInput(self.backend, port_id)
+        else:
+            self.backend = None
+            self.port, self.name = backend, str(port_id)
+
+        self._key_states = KeyStates()
         
         self.time = 0.0
-        self.events = []
-        self.notes = Seq()
+        self.events = EventRing(input_capacity, spill)
+        self._notes_cache = (-1, Seq()) # Event count when notes were rebuilt, notes
 
         self.forward_ports: List[OutputPort] = []
 
+        self.clock_follower: Optional[ClockFollower] = None # MIDI clock slave (see 'setClockSlave')
+        self._clock_origin: Optional[float] = None # Engine position of the first tick, when playing
+        self.connected = True # False when the device was unplugged (see 'watchPorts')
+
+        # Messages handled by the callback, waiting for the IO thread
+        self._queue = deque()
+        self.callback = False
+        self.setCallback(input_callback if callback is None else callback)
+
+
+    def setCallback(self, enable=True) -> None:
+        """Switch between callback and polling modes"""
+        if enable:
+            self.port.set_callback(self._callback)
+        elif self.callback:
+            self.port.cancel_callback()
+        self.callback = enable
+
+
+    def setClockSlave(self, enable=True) -> None:
+        """
+        Follow the MIDI clock received on this port:
+        the engine tempo and position are driven by incoming timing clock messages,
+        and start, continue and stop messages start and stop playback.
+
+        Switches the port to callback mode, so ticks are timestamped as soon as they arrive.
+        """
+        if enable:
+            self.clock_follower = ClockFollower(env.bpm)
+            self._clock_origin = None
+            self.setCallback(True)
+            self.port.ignore_types(sysex=True, timing=False, active_sense=True)
+        else:
+            self.clock_follower = None
+            self.port.ignore_types(sysex=True, timing=True, active_sense=True)
+
 
     def process(self) -> None:
-        """Process incoming message by polling, when the engine is started"""
+        """Process incoming messages, when the engine is started"""
+        if self.callback:
+            while self._queue:
+                self._store(*self._queue.popleft())
+            return
+        
+        # Polling
         while in_mess := self.port.get_message():
-            if env.display_notes:
-                print(f"Midi in: {in_mess}")
             event, time_delta = in_mess
             self.time += time_delta
-            self.events.append( (self.time, event) )
-
-            # Forward message to output ports
-            for port in self.forward_ports:
-                port.send(event)
-
-            status = event[0]
-            channel = status & 0xf
-            if status & 0xf0 == NOTE_ON:
-                note = event[1]
-                note_vel = event[2]
-                idx = (channel << 7) | note
-                if note_vel == 0:
-                    note_dur = self.time - self._key_states[idx][0]
-                    onset_vel = self._key_states[idx][1]
-                    # Save completed note
-                    note = Note(note, note_dur / env.note_dur, onset_vel)
-                    self.notes.add(note, head=self.time)
-                # Register note
-                self._key_states[idx][0] = self.time
-                self._key_states[idx][1] = note_vel
-            elif status & 0xf0 == NOTE_OFF:
-                note = event[1]
-                idx = (channel << 7) | note
-                note_dur = self.time - self._key_states[idx][0]
-                note_vel = self._key_states[idx][1]
-                # Save completed note
-                note = Note(note, note_dur / env.note_dur, note_vel)
-                self.notes.add(note, head=self.time)
-                # Unregister note
-                self._key_states[idx][0] = self.time
-                self._key_states[idx][1] = 0
+            self._forward(event)
+            if event[0] >= TIMING_CLOCK and self.clock_follower is not None:
+                self._follow_clock(event[0])
+                continue
+            self._register(event)
+            self._store(self.time, event)
+
+
+    def _callback(self, in_mess, data=None) -> None:
+        """Called from rtmidi's thread for every incoming message"""
+        event, time_delta = in_mess
+        self.time += time_delta
+        self._forward(event)
+        if event[0] >= TIMING_CLOCK and self.clock_follower is not None:
+            self._follow_clock(event[0])
+            return
+        self._register(event)
+        self._queue.append( (self.time, event) )
+
+
+    def _follow_clock(self, status: int) -> None:
+        """
+        Handle system real-time messages, as a clock slave.
+        Real-time messages aren't stored with other incoming messages.
+        """
+        follower = self.clock_follower
+        if status == TIMING_CLOCK:
+            t = follower.tick(clock.now())
+            if self._clock_origin is None:
+                # Not playing, only the tempo is followed
+                tick_position = None
+            else:
+                if follower.ticks == 1:
+                    # First tick after a start message, beginning of the song
+                    self._clock_origin = _position_at(t)
+                tick_position = self._clock_origin + (follower.ticks - 1) * TICK
+            env.commands.push(None, "sync", (t, tick_position, follower.bpm))
+            env.wakeup.set()
+        elif status == SONG_START or status == SONG_CONTINUE:
+            # Song position pointers aren't followed, continue starts over as well
+            follower.reset()
+            self._clock_origin = _position_at(clock.now())
+            play()
+        elif status == SONG_STOP:
+            self._clock_origin = None
+            stop()
+
+
+    def _forward(self, event) -> None:
+        """Forward message to output ports"""
+        for port in self.forward_ports:
+            port.send(event)
+
+
+    def _register(self, event) -> None:
+        """Update key states"""
+        self._key_states.update(self.time, event)
+
+
+    def _store(self, t: float, event) -> None:
+        if env.display_notes:
+            print(f"Midi in: {event}")
+        self.events.append(t, event)
+
+
+    @property
+    def notes(self) -> Seq:
+        """Completed notes, rebuilt from the events still in the ring buffer"""
+        count, seq = self._notes_cache
+        if count == self.events.count:
+            return seq
+        
+        key_states = KeyStates()
+        notes = []
+        for t, event in self.events:
+            released = key_states.update(t, event)
+            if released:
+                _, onset, vel = released
+                notes.append( (onset, Note(event[1], (t - onset) / env.note_dur, vel)) )
+        
+        seq = Seq()
+        seq.notes = sorted(notes, key=lambda x: x[0])
+        if notes:
+            seq.dur = max(t + n.dur for t, n in notes)
+            seq.head = seq.dur
+        self._notes_cache = (self.events.count, seq)
+        return seq
     
 
     def clear(self) -> None:
         """Clear all events"""
-        self.events = []
+        self.events.clear()
+        self._queue.clear()
         self.time = 0.0
-        self.notes.clear()
+        self._notes_cache = (-1, Seq())
 
 
     def isOpen(self) -> bool:
         return self.port.is_port_open()
 
 
+    def reopen(self, port_id: Union[int, str]) -> None:
+        """Open the device again (plugged in again), keeping recorded events and settings"""
+        old_port = self.port
+        if self.callback:
+            old_port.cancel_callback()
+        self.port, self.name = backends.openInput(self.backend, port_id)
+        if self.callback:
+            self.port.set_callback(self._callback)
+        if self.clock_follower is not None:
+            self.port.ignore_types(sysex=True, timing=False, active_sense=True)
+        self.connected = True
+        old_port.close_port()
+
+
     def close(self) -> None:
         """Close port"""
+        if self.callback:
+            self.port.cancel_callback()
         self.port.close_port()
+        self.events.close()
 
 
 
@@ -103,121 +252,416 @@ class OutputPort:
     
     Attributes:
         transpose (int): Global transposition (in semi-tones)
+        captured (list): Sent messages are appended to this list, as (time, message), when set
+    
+    Args:
+        port_id (int | str | None):
+            Port number or name to open. No MIDI device is opened with None
+        backend (str | object):
+            "rtmidi", "null", "capture", "file" (port_id is then a file path),
+            or a port object following rtmidi's MidiOut interface
+            (defaults to 'engine.port_backend', see 'backends')
     """
 
-    def __init__(self, port_id: Union[int, str]) -> None:
-        self.port, self.name = open_midioutput(port_id)
+    def __init__(self, port_id: Union[int, str, None], backend = None) -> None:
+        if port_id is None:
+            self.backend: Optional[str] = None
+            self.port, self.name = None, "offline"
+        elif backend is None or isinstance(backend, str):
+            self.backend = backend or port_backend
+            self.port, self.name = backends.openOutput(self.backend, port_id)
+        else:
+            self.backend = None
+            self.port, self.name = backend, str(port_id)
 
-        # Key state lookup table for every note of every midi channel
-        # each state is a list of onset time and key velocity
-        self._key_states = [ [0.0, 0] for _ in range(16 * 128) ]
+        self._key_states = KeyStates()
+        self._channel_states = ChannelStates()
         
         self.time = 0.0
-        self.events = []
+        self.events = EventQueue()
+        self._frame_wall = 0.0 # Wall time of last processing, when timing stats are enabled
 
         self._save_notes = False
         self.notes = Seq()
+        self.captured: Optional[List[tuple]] = None
+
+        # Dedicated sender thread
+        self._sender: Optional[threading.Thread] = None
+        self._sender_cond = threading.Condition()
+        # Held while writing to the port, rtmidi ports can't send from several threads at once
+        # (the MIDI clock thread sends ticks while the IO or sender thread sends messages)
+        self._send_lock = threading.Lock()
+        # Index of this port in the remote sender process
+        self._remote_index: Optional[int] = None
 
         # Properties
         self.transpose: int = 0
+        self.filter_redundant: bool = filter_redundant # Drop messages that wouldn't change the device state
+        self.filtered = 0 # Number of dropped messages
+        self.limiter: Optional[RateLimiter] = None
+        if bandwidth is not None and port_id is not None:
+            # Not for offline ports: the limiter runs on the wall clock, not on render time
+            self.setBandwidth(bandwidth, bandwidth_burst)
+        self.midi_clock: Optional[MidiClock] = None
+        self.connected = True # False when the device was unplugged (see 'watchPorts')
+
+        # Reused message buffers, by message length, in realtime mode (see 'setRealtime').
+        # Only for backends that don't keep sent messages
+        self._buffers = [[], [0], [0, 0], [0, 0, 0]] if self.backend in ("rtmidi", "null", "file") else None
+
+
+    @property
+    def threaded(self) -> bool:
+        return self._sender is not None
+
+
+    def setThreaded(self, enable=True) -> None:
+        """
+        Send messages from a dedicated thread, with its own timed queue,
+        so that a blocking port can't delay the other ones
+        """
+        if enable and self._sender is None and self.port is not None:
+            self._sender = threading.Thread(target=self._run_sender, daemon=True)
+            self._sender.start()
+        elif not enable and self._sender is not None:
+            sender = self._sender
+            with self._sender_cond:
+                self._sender = None
+                self._sender_cond.notify()
+            sender.join()
+
+
+    def setRemote(self, enable=True) -> None:
+        """
+        Hand this port over to the remote sender process (see 'startRemote')
+        or take it back.
+        Messages are transposed, filtered and registered when pushed rather than when sent,
+        ports with a bandwidth limit stay in this process.
+        """
+        if enable and self.limiter is not None:
+            print(f"Port '{self.name}' has a bandwidth limit, it isn't sent from the remote process")
+            return
+        if enable and self._remote_index is None and self.backend == "rtmidi":
+            # The remote process opens ports with rtmidi
+            self.setThreaded(False)
+            self.port.close_port()
+            self._remote_index = _remote.openPort(self.name)
+        elif not enable and self._remote_index is not None:
+            self._remote_index = None
+            self.port, _ = open_midioutput(self.name)
 
 
-    def process(self, time_delta: float) -> None:
+    def setBandwidth(self, rate: Optional[float], burst: Optional[float] = None) -> None:
         """
-        Process incoming message by polling, when the engine is started
+        Limit the number of bytes sent per second (None for no limit).
+        Notes are sent first, controller data is delayed and thinned when over budget.
+
+        Args:
+            rate: Budget in bytes per second ('DIN_BANDWIDTH' for a 5-pin DIN link)
+            burst: Number of bytes that can be sent at once
+        """
+        if rate and self._remote_index is not None:
+            print(f"Port '{self.name}' is sent from the remote process, which has no bandwidth limit")
+            return
+        self.limiter = RateLimiter(rate, burst) if rate else None
+
+
+    def setClockMaster(self, enable=True) -> None:
+        """
+        Send MIDI clock messages (24 per beat), following the engine tempo,
+        with start and stop messages when playback starts and stops.
+        Ticks are sent from a dedicated thread, see 'MidiClock'.
+        """
+        if enable and self.midi_clock is None and self.port is not None:
+            self.midi_clock = MidiClock(self._send_realtime, _time_at, lambda: clock)
+        elif not enable and self.midi_clock is not None:
+            self.midi_clock.close()
+            self.midi_clock = None
+
+
+    def _send_realtime(self, message) -> None:
+        """Send a system real-time message right away, from any thread"""
+        if self._remote_index is not None:
+            _remote.push(self._remote_index, time.perf_counter(), message)
+        elif self.port is not None:
+            with self._send_lock:
+                self.port.send_message(message)
+
+
+    def _flush(self) -> None:
+        """Send messages delayed by the bandwidth limiter, when the budget allows it"""
+        if self.limiter is not None and len(self.limiter) > 0:
+            for event in self.limiter.due(clock.now()):
+                self._transmit(event)
+
+
+    def _run_sender(self) -> None:
+        """Sender thread loop, sleeps until the next queued event is due"""
+        while self._sender is not None:
+            self._flush()
+            with self._sender_cond:
+                limiter_wait = self.limiter.wait(clock.now()) if self.limiter is not None else max_sleep
+                if not self.events:
+                    self._sender_cond.wait(min(max_sleep, limiter_wait))
+                    continue
+                intended = _time_at(self.events.nextTime())
+                timeout = intended - clock.now()
+                if timeout > 0.0:
+                    self._sender_cond.wait(min(timeout, max_sleep, limiter_wait))
+                    continue
+                _, event = self.events.pop()
+            
+            # Send outside of the lock, so the IO thread is never blocked
+            self.send(event)
+            if _stats is not None:
+                _stats.message(self.name, intended, clock.now(), event)
+
+
+    def cancel(self) -> None:
+        """Drop every pending event, and release notes whose note-off was dropped"""
+        if self._remote_index is not None:
+            _remote.cancel(self._remote_index)
+            # Dropped messages were registered when pushed
+            self._channel_states.reset()
+        with self._sender_cond:
+            self.events.clear()
+            if self.limiter is not None:
+                # Registered as sent, but never sent
+                for event in self.limiter.clear():
+                    self._channel_states.forget(event)
+        self.allNotesOff()
+
+
+    def process(self, now: float) -> None:
+        """
+        Send every queued event that is due, when the engine is started
         
         Args:
-            time_delta: in seconds
+            now: engine position, in time units (1 second at 120 bpm)
         """
 
-        self.time += time_delta
+        self.time = now
 
-        while (len(self.events) > 0) and (self.events[0] <= self.time):
-            event = heapq.heappop(self.events)
+        if self._sender is not None or self._remote_index is not None:
+            # Sent from the port thread or from the remote process
+            return
+        
+        self._flush()
+
+        buffers = self._buffers
+        if not realtime or self.captured is not None or self.limiter is not None:
+            # Sent messages may be kept
+            buffers = None
+
+        if _stats is None or self.port is None:
+            if buffers is None:
+                for _, event in self.events.popUntil(self.time):
+                    self.send(event)
+                return
+            pop = self.events.popInto
+            while (event := pop(self.time, buffers)) is not None:
+                self.send(event)
+            return
+        
+        self._frame_wall = clock.now()
+        if buffers is None:
+            for t, event in self.events.popUntil(self.time):
+                self.send(event)
+                intended = self._frame_wall + (t - self.time) * 120 / env.bpm
+                _stats.message(self.name, intended, clock.now(), event)
+            return
+        pop = self.events.popInto
+        while (event := pop(self.time, buffers)) is not None:
             self.send(event)
+            intended = self._frame_wall + (self.events.popped_time - self.time) * 120 / env.bpm
+            _stats.message(self.name, intended, clock.now(), event)
 
 
-    def push(self, time, event) -> None:
+    def push(self, delay, event) -> None:
         """
-        Push an event to be parsed by this output port
+        Push an event to be sent by this output port
 
         Args:
-            time:
-            event:
+            delay: delay before sending, relative to the port current time
+            event: midi message
         """
-        time += self.time # Offset by internal port relative time
-
-        if time <= self.time:
+        t = self.time + delay # Offset by internal port relative time
+
+        if self._remote_index is not None:
+            self._push_remote([ (t, event) ])
+        elif self._sender is not None:
+            with self._sender_cond:
+                if t < self.events.nextTime():
+                    # New head of queue
+                    self._sender_cond.notify()
+                self.events.push(t, event)
+        elif t <= self.time:
             self.send(event)
+            if _stats is not None and self.port is not None \
+                    and threading.current_thread() is _thread:
+                intended = self._frame_wall + delay * 120 / env.bpm
+                _stats.message(self.name, intended, clock.now(), event)
         else:
-            heapq.heappush(self.events, (time, event))
+            self.events.push(t, event)
 
 
-    def send(self, event) -> None:
+    def pushMany(self, events: List[tuple]) -> None:
+        """
+        Push a batch of (time, event) tuples to be sent by this output port
+
+        Args:
+            events: list of (delay, midi message), with delays relative to the port current time
+        """
+        if self._remote_index is not None:
+            self._push_remote([ (self.time + delay, event) for delay, event in events ])
+            return
+
+        if self._sender is not None:
+            with self._sender_cond:
+                batch = [ (self.time + delay, event) for delay, event in events ]
+                if min(batch)[0] < self.events.nextTime():
+                    self._sender_cond.notify()
+                self.events.pushMany(batch)
+            return
+
+        # Due events are sent right away, the other ones are queued as a single sorted run
+        due = [ e for e in events if e[0] <= 0.0 ]
+        if due:
+            for delay, event in sorted(due):
+                self.push(delay, event)
+            events = [ e for e in events if e[0] > 0.0 ]
+        self.events.pushMany(events, self.time)
+
+
+    def _push_remote(self, events: List[tuple]) -> None:
+        """
+        Hand (time, event) tuples over to the remote process.
+        They are transposed, filtered and registered now, in time order (note-ons last),
+        as they would be when sent
+        """
+        for t, event in sorted(events, key=lambda e: (e[0], e[1][0] & 0xf0 == NOTE_ON and e[1][2] > 0)):
+            event = self._prepare(event)
+            if event is not None:
+                self._transmit(event, t)
+        # Woken once per batch
+        _remote.wake()
+
+
+    def _prepare(self, event) -> Optional[List[int]]:
+        """Transposed message, None when dropped by the redundant filter"""
         if self.transpose != 0:
-            event[1] = min(max(event[1] + self.transpose, 0), 127)
-        
+            # Copied, the message may be shared (see 'MidiBus')
+            event = [event[0], min(max(event[1] + self.transpose, 0), 127), *event[2:]]
+
+        if not self._channel_states.update(event) and self.filter_redundant:
+            # Wouldn't change the device state
+            self.filtered += 1
+            return None
+        return event
+
+
+    def send(self, event) -> None:
+        event = self._prepare(event)
+        if event is None:
+            return
+
         # print(f"{self.name[:10]}  {event=}")
 
-        status = event[0]
-        channel = status & 0xf
-        note = event[1]
+        if self.limiter is not None:
+            now = clock.now()
+            for deferred in self.limiter.before(event, now):
+                self._transmit(deferred)
+            if not self.limiter.allow(event, now):
+                # Delayed, over bandwidth budget
+                return
+        
+        self._transmit(event)
 
-        if status & 0xf0 == NOTE_ON:
-            note_vel = event[2]
 
-            # Register note
-            idx = (channel << 7) | note
-            self._key_states[idx][0] = self.time
-            self._key_states[idx][1] = note_vel
+    def _transmit(self, event, t: Optional[float] = None) -> None:
+        """
+        Register and send a message
 
-            if self._save_notes and note_vel == 0:
-                note_dur = self.time - self._key_states[idx][0]
-                onset_vel = self._key_states[idx][1]
-                # Save completed note
-                note = Note(note, note_dur / env.note_dur, onset_vel)
-                self.notes.add(note, head=self.time)
-
-        elif status & 0xf0 == NOTE_OFF:
-            # Unregister note
-            idx = (channel << 7) | note
-            note_dur = self.time - self._key_states[idx][0]
-            note_vel = self._key_states[idx][1]
-            self._key_states[idx][0] = self.time
-            self._key_states[idx][1] = 0
-
-            if self._save_notes:
+        Args:
+            t: Engine position to send at, for the remote process (right away when None)
+        """
+        global _new_noteon
+
+        at = self.time if t is None else t
+        kind = event[0] & 0xf0
+        if kind == NOTE_ON or kind == NOTE_OFF:
+            released = self._key_states.update(at, event)
+            if kind == NOTE_ON and event[2] > 0:
+                _new_noteon = True
+            elif released and self._save_notes:
                 # Save completed note
+                _, onset, note_vel = released
                 self.notes.add(
-                    Note(note, note_dur / env.note_dur, note_vel),
-                    head=self.time
+                    Note(event[1], (at - onset) / env.note_dur, note_vel),
+                    head=at
                 )
         
-        self.port.send_message(event)
+        if self.captured is not None:
+            self.captured.append( (at, event) )
+        if self._remote_index is not None:
+            if t is None:
+                _remote.push(self._remote_index, time.perf_counter(), event)
+            else:
+                _remote.push(self._remote_index, _perf_time(t), event, wake=False)
+        elif self.port is not None:
+            with self._send_lock:
+                self.port.send_message(event)
+
+        if env.verbose and not env.display_notes:
+            print("Sent", event)
 
 
     def allNotesOff(self) -> None:
-        for idx in range(16 * 128):
-            if self._key_states[idx][1] != 0:
-                # This note is still active, send NOTE_OFF message
-                channel, pitch = divmod(idx, 128)
-                self.port.send_message( [NOTE_OFF | channel, pitch, 0] )
+        """Send note-off messages for every active note"""
+        if self._remote_index is not None:
+            _remote.panic(self._remote_index)
+            self._key_states.clear()
+            return
+        for channel, pitch in self._key_states.release():
+            if self.port is not None:
+                with self._send_lock:
+                    self.port.send_message( [NOTE_OFF | channel, pitch, 0] )
 
 
     def clear(self) -> None:
         """Clear all events"""
-        self.events = []
+        self.events.clear()
         self.time = 0.0
         self.notes.clear()
+        self._channel_states.reset()
     
 
     def isOpen(self) -> bool:
-        return self.port.is_port_open()
+        if self._remote_index is not None:
+            return True
+        return self.port is not None and self.port.is_port_open()
+
+
+    def reopen(self, port_id: Union[int, str]) -> None:
+        """
+        Open the device again (plugged in again), keeping pending events and settings.
+        The device state is considered lost, so redundant messages are sent again.
+        """
+        new_port, self.name = backends.openOutput(self.backend, port_id)
+        with self._send_lock:
+            old_port, self.port = self.port, new_port
+            old_port.close_port()
+        self._channel_states.reset()
+        self.connected = True
 
 
     def close(self) -> None:
         """Close port"""
-        self.port.close_port()
+        self.setClockMaster(False)
+        self.setThreaded(False)
+        self.setRemote(False)
+        if self.port is not None:
+            self.port.close_port()
 
 
 
@@ -225,14 +669,40 @@ _midiout_ports: Dict[str, OutputPort] = dict()
 _midiin_ports: Dict[str, InputPort] = dict()
 
 time_res = 0.01
+deadline_scheduling = True  # Sleep until the next pending event instead of polling every 'time_res'
+max_sleep = 0.2             # Longest the IO thread will sleep without checking for new work
+lookahead = 0.2             # Sequences are rendered this long before they start (in seconds)
+input_callback = False      # Input ports handle messages from rtmidi's callback instead of polling
+input_capacity = 65536      # Number of events kept in memory by input ports
+threaded_ports = False      # Output ports send messages from their own thread
+filter_redundant = False    # Output ports drop program, controller, pitch bend and aftertouch messages that don't change anything
+bandwidth: Optional[float] = None # Output ports bandwidth budget, in bytes per second (see 'setBandwidth')
+bandwidth_burst: Optional[float] = None # Output ports burst size, in bytes (defaults to 10ms of budget)
+port_backend = "rtmidi"     # Backend of opened ports: "rtmidi", "null", "capture", "file" or "bus" (see 'setBackend')
+realtime = False            # Suspend garbage collection during playback and reuse message buffers (see 'setRealtime')
+gc_idle_margin = 0.002      # In realtime mode, young objects are collected only when the IO thread can sleep this long (in seconds)
 metronome = False
 _is_running = False
 _thread = None
-_active_notes = [0b0000000000000000] * 128 # Active notes lookup table
+_new_noteon = False
+_stats: Optional[TimingStats] = None # Timing measurements, when enabled
+clock: Clock = Clock()
+_tempo_map = TempoMap() # Tempo curve, converts engine positions to clock times and back
+_remote: Optional["RemoteEngine"] = None
+_registry = PortRegistry() # Cached list of rtmidi ports (see 'watchPorts')
+_versions_printed = False
+_gc_suspended: Optional[bool] = None # Whether automatic garbage collection was enabled, while suspended
+_click_messages: Dict[tuple, tuple] = dict() # Metronome note-on and note-off messages, by (channel, pitch)
+_default_outputs: Optional[Dict[str, OutputPort]] = None
+
 
-# Signal triggers to communicate with IO thread
-_trigger_play = False
-_trigger_stop = False
+
+def _print_versions() -> None:
+    """Printed when the first port is opened, rather than on import"""
+    global _versions_printed
+    if not _versions_printed:
+        print(f"Using python-rtmidi V{rtmidi.version.version} and rtmidi V{rtmidi.get_rtmidi_version()}")
+        _versions_printed = True
 
 
 
@@ -243,42 +713,49 @@ def listInputs():
 
 
 def getInputs():
-    midiin = rtmidi.MidiIn()
-    return [ (i, midiin.get_port_name(i)) for i in range(midiin.get_port_count()) ]
+    if port_backend != "rtmidi":
+        return [ (i, name) for i, name in enumerate(_midiin_ports) ]
+    return list(enumerate(_registry.ports("input")))
 
 
-def getInput(port_id : Union[int, str]) -> Optional[InputPort]:
+def getInput(
+        port_id : Union[int, str],
+        callback: Optional[bool] = None,
+        backend: Optional[str] = None
+    ) -> Optional[InputPort]:
     """
     Open and return a MIDI input port or return an already opened one.
     
     Args:
         port_id (int | str)
             Port number or name (substring included) to open
+        callback (bool)
+            Handle incoming messages from rtmidi's callback instead of polling
+        backend (str)
+            Backend to open the port with (defaults to 'port_backend'),
+            "bus" opens a virtual input receiving the messages sent to a bus
     """
-    if isinstance(port_id, int):
-        # A port number
-        for i, port_name in getInputs():
-            if port_id == i:
-                port_id = port_name
-                break
-        else:
-            print(f"Can't find port '{port_id}'")
-            return None
-    elif isinstance(port_id, str):
-        # A port name (or name substring)
-        for i, port_name in getInputs():
-            if port_id.lower() in port_name.lower():
-                port_id = port_name
-                break
-        else:
+    backend = backend or port_backend
+    if backend != "rtmidi":
+        # Ports can't be listed, every name opens a port
+        port_id = port_id if isinstance(port_id, str) else f"{backend} {port_id}"
+    else:
+        # A port number or name (or name substring)
+        port_name = _registry.find("input", port_id)
+        if port_name is None:
             print(f"Can't find port '{port_id}'")
             return None
+        port_id = port_name
     
     if port_id in _midiin_ports and _midiin_ports[port_id].isOpen():
-        return _midiin_ports[port_id]
+        port = _midiin_ports[port_id]
+        if callback is not None and callback != port.callback:
+            port.setCallback(callback)
+        return port
 
+    _print_versions()
     print(f"Opening port {port_id}")
-    port = InputPort(port_id)
+    port = InputPort(port_id, callback, backend=backend)
     if port:
         assert isinstance(port_id, str)
         _midiin_ports[port_id] = port
@@ -293,49 +770,143 @@ def listOutputs():
 
 
 def getOutputs():
-    midiout = rtmidi.MidiOut()
-    return [ (i, midiout.get_port_name(i)) for i in range(midiout.get_port_count()) ]
+    if port_backend != "rtmidi":
+        return [ (i, name) for i, name in enumerate(_midiout_ports) ]
+    return list(enumerate(_registry.ports("output")))
 
 
-def getOutput(port_id : Union[int, str]) -> Optional[OutputPort]:
+def getOutput(port_id : Union[int, str], backend: Optional[str] = None) -> Optional[OutputPort]:
     """
     Open and return a MIDI output port or return an already opened one
     
     Args:
         port_id (int | str)
             Port number or name (substring included) to open
+        backend (str)
+            Backend to open the port with (defaults to 'port_backend'),
+            "bus" sends messages to an in-process bus (see 'bus.getBus')
     """
-    if isinstance(port_id, int):
-        # A port number
-        for i, port_name in getOutputs():
-            if port_id == i:
-                port_id = port_name
-                break
-        else:
-            print(f"Can't find port '{port_id}'")
-            return None
-    elif isinstance(port_id, str):
-        # A port name (or name substring)
-        for i, port_name in getOutputs():
-            if port_id.lower() in port_name.lower():
-                port_id = port_name
-                break
-        else:
+    backend = backend or port_backend
+    if backend != "rtmidi":
+        # Ports can't be listed, every name opens a port
+        port_id = port_id if isinstance(port_id, str) else f"{backend} {port_id}"
+    else:
+        # A port number or name (or name substring)
+        port_name = _registry.find("output", port_id)
+        if port_name is None:
             print(f"Can't find port '{port_id}'")
             return None
+        port_id = port_name
     
     if port_id in _midiout_ports and _midiout_ports[port_id].isOpen():
         return _midiout_ports[port_id]
 
+    _print_versions()
     print(f"Opening port {port_id}")
-    port = OutputPort(port_id)
+    port = OutputPort(port_id, backend)
     if port:
         assert isinstance(port_id, str)
         _midiout_ports[port_id] = port
+        if _remote is not None:
+            port.setRemote()
+        elif threaded_ports:
+            port.setThreaded()
 
     return port
 
 
+def watchPorts(enable=True, interval: float = 1.0) -> None:
+    """
+    Watch for plugged and unplugged MIDI devices, from a background thread.
+    Port lists are kept up to date, and opened ports are reopened
+    when their device is plugged in again.
+
+    Args:
+        interval (float): Time between two port enumerations, in seconds
+    """
+    if enable:
+        _registry.addListener(_rebind_ports)
+        _registry.watch(interval)
+    else:
+        _registry.watch(None)
+        _registry.removeListener(_rebind_ports)
+
+
+def _rebind_ports(added: list, removed: list) -> None:
+    """Reopen ports of reconnected devices, called from the port watcher thread"""
+    global _midiout_ports, _midiin_ports
+    for kind, name in removed:
+        port = (_midiout_ports if kind == "output" else _midiin_ports).get(name)
+        if port is not None and port.backend == "rtmidi":
+            print(f"Port {name} disconnected")
+            port.connected = False
+
+    for kind, name in added:
+        ports = _midiout_ports if kind == "output" else _midiin_ports
+        for old_name, port in ports.items():
+            # ALSA addresses may change when a device is plugged in again
+            if port.connected or port.backend != "rtmidi" or portKey(old_name) != portKey(name):
+                continue
+            if getattr(port, "_remote_index", None) is not None:
+                continue
+            try:
+                port.reopen(name)
+            except Exception as e:
+                print(f"Can't reopen port {name}: {e}")
+                break
+            print(f"Port {name} reconnected")
+            # Replaced rather than modified, the IO thread may be iterating over ports
+            ports = { (name if k == old_name else k): p for k, p in ports.items() }
+            if kind == "output":
+                _midiout_ports = ports
+            else:
+                _midiin_ports = ports
+            break
+
+
+def defaultOutputs() -> Dict[str, OutputPort]:
+    """
+    Output ports opened by default, by name: port 0 as "default",
+    and known synths ("microfreak", "fluidsynth", "amsynth", "preenfm", "irig").
+    Ports are opened on first call.
+    """
+    global _default_outputs
+    if _default_outputs is None:
+        ports = dict()
+        ports["default"] = getOutput(0)
+        for port_idx, port_name in getOutputs():
+            for name in ("microfreak", "fluid", "amsynth", "preenfm", "irig"):
+                if name in port_name.lower():
+                    ports["fluidsynth" if name == "fluid" else name] = getOutput(port_idx)
+        _default_outputs = ports
+    return _default_outputs
+
+
+def _default_output() -> Optional[OutputPort]:
+    """Preferred output port, opened on first use of 'env.default_output'"""
+    ports = defaultOutputs()
+    for name in ("microfreak", "fluidsynth", "irig"):
+        if name in ports:
+            return ports[name]
+    return ports["default"]
+
+
+class LazyOutputs(Mapping):
+    """Read-only view of 'defaultOutputs', ports are only opened when it is first read"""
+
+    def __getitem__(self, name: str) -> OutputPort:
+        return defaultOutputs()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(defaultOutputs())
+
+    def __len__(self) -> int:
+        return len(defaultOutputs())
+
+    def __repr__(self) -> str:
+        return repr(defaultOutputs())
+
+
 def start_io():
     global _thread
     global _is_running
@@ -343,6 +914,8 @@ def start_io():
     if _is_running:
         return
     _is_running = True
+    env.commands.clear()
+    env.commands.running = True
     
     _thread = threading.Thread(target=_run, daemon=True)
     _thread.start()
@@ -353,8 +926,13 @@ def stop_io():
     global _is_running
 
     _is_running = False
+    env.wakeup.set()
     if _thread != None:
         _thread.join()
+    env.commands.running = False
+    # Positions of the next run start from 0 again
+    _tempo_map.reset(0.0, 0.0, env.bpm)
+    _resume_gc()
     print("IO thread stopped")
 
 
@@ -363,49 +941,204 @@ def is_started():
     return _is_running
 
 
-def _run():
-    global _trigger_play, _trigger_stop
+def _position_at(t: float) -> float:
+    """Engine position (in time units) at a given clock time"""
+    # A time unit (Seq.length=1) is 1 second at 120bpm
+    return _tempo_map.positionAt(t)
+
+
+def _time_at(position: float) -> float:
+    """Clock time of a given engine position"""
+    return _tempo_map.timeAt(position)
+
+
+def _perf_time(position: float) -> float:
+    """'time.perf_counter' time of a given engine position, used by the remote process"""
+    return clock.origin * 1e-9 + _time_at(position)
+
+
+def _time_to_next_event(output_ports, next_wakeup: float, limit: float) -> float:
+    """
+    Returns the time left until the earliest pending event, in time units,
+    or 'limit' if nothing is due before.
+
+    Looks at the head of every output port queue
+    and at the next track wakeup (time left, in time units).
+    """
+    deadline = min(limit, next_wakeup)
+    for output_port in output_ports:
+        if output_port.threaded:
+            continue
+        if output_port.events:
+            deadline = min(deadline, output_port.events.nextTime() - output_port.time)
+        if output_port.limiter is not None and len(output_port.limiter) > 0:
+            # Delayed messages
+            deadline = min(deadline, output_port.limiter.wait(clock.now()) * env.bpm / 120)
+    return deadline
+
+
+def _next_deadline(
+        next_click: float,
+        next_command: float = math.inf,
+        next_wakeup: float = math.inf,
+        position: Optional[float] = None
+    ) -> float:
+    """
+    Returns the time the IO thread can sleep until the next pending event, in seconds.
+
+    Args:
+        next_click: time left until next metronome click, in time units
+        next_command: time left until next pending command, in time units
+        next_wakeup: time left until next track update, in time units
+        position: current engine position, to follow tempo changes until the deadline
+    """
+    deadline = _time_to_next_event(
+        _midiout_ports.values(), next_wakeup,
+        max_sleep * env.bpm / 120
+    )
+    if env.METRONOME:
+        deadline = min(deadline, next_click)
+    deadline = min(deadline, next_command)
+    
+    if position is None or deadline == math.inf:
+        deadline *= 120 / env.bpm
+    else:
+        deadline = _time_at(position + deadline) - _time_at(position)
+
+    if any(not p.callback for p in _midiin_ports.values()):
+        # Input ports must still be polled
+        deadline = min(deadline, time_res)
 
-    t_prev = time.time()
-    rel_time = 0.0
-    metronome_time = 0.0
+    return min(max(deadline, 0.0), max_sleep)
+
+
+def _update_tracks(
+        scheduler: TrackScheduler,
+        position: float,
+        lookahead_units: float,
+        port_map: Optional[dict] = None
+    ) -> None:
+    """
+    Update due tracks and push rendered messages to output port queues
+
+    Args:
+        port_map: replacement output ports, indexed by track port (used for offline rendering)
+    """
+    stats = _stats if port_map is None else None
+    for track, time_delta in scheduler.due(position, lookahead_units):
+        if stats is None:
+            new_events = track.update(time_delta, lookahead_units)
+        else:
+            t_update = time.perf_counter()
+            new_events = track.update(time_delta, lookahead_units)
+            stats.track(track, time.perf_counter() - t_update)
+        if new_events:
+            port: Optional[OutputPort] = track.port
+            if port_map is not None:
+                port = port_map.get(port)
+            elif port is None:
+                port = env.default_output
+            if port:
+                port.pushMany(new_events)
+
+
+def _run():
+    global _new_noteon
+
+    # Position (in time units) is computed from the clock
+    # and from the tempo map, so it doesn't drift
+    t_start = clock.now()
+    # Tempo changes scheduled while stopped are kept (see 'setBpm')
+    _tempo_map.moveAnchor(t_start, 0.0, env.bpm)
+    bpm = env.bpm # Last tempo set by the engine, to detect changes made to 'env.bpm'
+    position = 0.0
+    next_click = 0.5
     metronome_click_count = 0
-    is_playing = _trigger_play
-    out_events = []
+    is_playing = False
+    scheduler = TrackScheduler() # Running tracks, by next update position
 
     while _is_running:
-        t_frame = time.time()
-        time_delta = t_frame - t_prev
-        t_prev = t_frame
-
-        time_delta *= env.bpm / 120   # A time unit (Seq.length=1) is 1 second at 120bpm
-        rel_time += time_delta
-
-        # Check for trigger signals
-        if _trigger_play:
-            is_playing = True
-            out_events.clear()
-            # all_notes_off()
-            _trigger_play = False # Unset signal
-        if _trigger_stop:
-            is_playing = False
-            out_events.clear()
-            # all_notes_off()
-            _trigger_stop = False # Unset signal
+        stats = _stats
+        if stats is not None:
+            t_loop = time.perf_counter()
+            allocations = gc.get_count()[0]
+
+        t_frame = clock.now()
+        if env.bpm != bpm:
+            _tempo_map.setTempo(position, env.bpm)
+        position = _position_at(t_frame)
+        _tempo_map.trim(position)
+        env.bpm = bpm = _tempo_map.bpmAt(position)
+
+        # Apply due commands, in order
+        scheduler.setTracks(tracks.priority_list, position)
+        lookahead_units = lookahead * env.bpm / 120
+        for command in env.commands.drain(position, lookahead_units):
+            if command.target is not None:
+                # Time left until the target position
+                delay = command.at - position if command.at is not None else 0.0
+                command.target._apply(command.name, command.args, max(delay, 0.0), position)
+                scheduler.wake(command.target, position)
+            elif command.name == "play" and not is_playing:
+                # Applied 'lookahead' before its target position, like track commands,
+                # so that tracks started at the same position are rendered in time.
+                # Already running tracks (and their queued events) are left alone
+                is_playing = True
+                if realtime:
+                    # Suspended and resumed by the IO thread only, in command order
+                    _suspend_gc()
+                env.play_origin = position if command.at is None else max(command.at, position)
+                next_click = env.play_origin + 0.5
+                for output_port in _midiout_ports.values():
+                    output_port.cancel()
+                    if output_port.midi_clock is not None:
+                        output_port.midi_clock.start(env.play_origin)
+            elif command.name == "stop":
+                is_playing = False
+                for output_port in _midiout_ports.values():
+                    output_port.cancel()
+                    if output_port.midi_clock is not None:
+                        output_port.midi_clock.stop()
+                _resume_gc()
+            elif command.name == "bpm":
+                # Applied to the tempo map right away, so scheduled changes are known ahead
+                new_bpm, ramp, at = command.args
+                _tempo_map.setTempo(position if at is None else max(at, position), new_bpm, ramp)
+                env.bpm = bpm = _tempo_map.bpmAt(position)
+                lookahead_units = lookahead * env.bpm / 120
+                for output_port in _midiout_ports.values():
+                    if output_port.midi_clock is not None:
+                        output_port.midi_clock.wake()
+            elif command.name == "sync":
+                # Tick received from an external MIDI clock (see 'InputPort.setClockSlave')
+                t_tick, tick_position, env.bpm = command.args
+                bpm = env.bpm
+                if tick_position is not None and is_playing \
+                        and tick_position + (t_frame - t_tick) * bpm / 120 >= position:
+                    # Lock on the tick position (but never move backwards)
+                    _tempo_map.reset(t_tick, tick_position, bpm)
+                else:
+                    _tempo_map.reset(t_frame, position, bpm)
+                lookahead_units = lookahead * env.bpm / 120
+                for output_port in _midiout_ports.values():
+                    if output_port.midi_clock is not None:
+                        output_port.midi_clock.wake()
         
         # Process incoming messages
         for input_port in _midiin_ports.values():
             input_port.process()
 
-        if is_playing:
-            _must_sort = False
+        # Send due messages first, rendering comes after
+        _new_noteon = False # Used to display notes in terminal
+        for output_port in _midiout_ports.values():
+            output_port.process(position)
 
+        if is_playing:
             # Run metronome
-            metronome_time += time_delta
-            if metronome_time > 0.5:
+            if position >= next_click:
                 metronome_click_count += 1
-                metronome_time -= 0.5
-                if env.METRONOME:
+                next_click += 0.5
+                if env.METRONOME and env.default_output:
                     if metronome_click_count % env.METRONOME_DIV == 0:
                         metro_pitch = env.METRONOME_NOTES[0]
                         # if _armed:
@@ -416,70 +1149,68 @@ def _run():
                         #     clicking = env.METRONOME_CLICK
                     else:
                         metro_pitch = env.METRONOME_NOTES[1]
-                    note_on = [NOTE_ON | env.METRONOME_CHAN, metro_pitch, 100]
-                    out_events.append( (rel_time, note_on, env.default_output) )
-                    note_off = [NOTE_OFF | env.METRONOME_CHAN, metro_pitch, 0]
-                    out_events.append( (rel_time + env.METRONOME_DUR, note_off, env.default_output) )
-                    _must_sort = True
-
-            # Get midi messages from tracks
-            for track in tracks.priority_list:
-                if new_events := track.update(time_delta):
-                    for t, mess in new_events:
-                        out_events.append( (t + rel_time, mess, track.port) )
-                    _must_sort = True
-            
-            if _must_sort:
-                # Sort by time first, then midi off precedes midi on messages
-                heapq.heapify(out_events)
-                # out_events.sort(key=lambda n: (n[0],n[1][0]), reverse=True)
-                _must_sort = False
-
-            # Process outgoing messages
-            _new_noteon = False # Used to display notes in terminal
-            while out_events and out_events[0][0] < rel_time:
-                # A midi event is made of : absolute_t, midi_mess, midi_port
-                # A midi_mess is made of : status, pitch, vel
-                t_pos, mess, port = heapq.heappop(out_events)
-                if mess[0]>>4 == 9: # note on
-                    chan = mess[0] & 0xf
-                    _active_notes[mess[1]] |= (1 << chan)
-                    _new_noteon = True
-                elif mess[0]>>4 == 8: # note off
-                    chan = mess[0] & 0xf
-                    _active_notes[mess[1]] &= (65535 ^ (1 << chan))
-                
-                port: Optional[OutputPort] = port or env.default_output
-                if port:
-                    port.push(t_pos - rel_time, mess)  # Play immediately
-                
-                if env.verbose and not env.display_notes:
-                    print("Sent", mess)
-        
-        # Process output ports
-        for output_port in _midiout_ports.values():
-            output_port.process(time_delta)
+                    # Messages are built once, they are never modified
+                    click = _click_messages.get( (env.METRONOME_CHAN, metro_pitch) )
+                    if click is None:
+                        click = (
+                            [NOTE_ON | env.METRONOME_CHAN, metro_pitch, 100],
+                            [NOTE_OFF | env.METRONOME_CHAN, metro_pitch, 0],
+                        )
+                        _click_messages[(env.METRONOME_CHAN, metro_pitch)] = click
+                    env.default_output.push(0.0, click[0])
+                    env.default_output.push(env.METRONOME_DUR, click[1])
+
+            # Render upcoming sequences ahead of time, into the output port queues
+            _update_tracks(scheduler, position, lookahead_units)
 
         if env.display_notes and _new_noteon:
             notes_str = ['.'] * (env.display_range[1] - env.display_range[0] + 1)
-            for i, n in enumerate(_active_notes):
-                if n == 0:
-                    continue
-                if i < env.display_range[0]: notes_str[0] = '<'
-                elif i > env.display_range[1]: notes_str[-1] = '>'
-                else: notes_str[i - env.display_range[0]] = 'x'
+            for output_port in _midiout_ports.values():
+                for _, i in output_port._key_states.activeNotes():
+                    if i < env.display_range[0]: notes_str[0] = '<'
+                    elif i > env.display_range[1]: notes_str[-1] = '>'
+                    else: notes_str[i - env.display_range[0]] = 'x'
             
             notes_str = ''.join(notes_str)
             print(str(env.display_range[0]) + '[' + notes_str + ']' + str(env.display_range[1]))
         
-        time.sleep(min(max(time_res, 0), 0.2))
+        if stats is not None:
+            t_sleep = time.perf_counter()
+            stats.loop.add(t_sleep - t_loop)
+            allocations = gc.get_count()[0] - allocations
+            if allocations >= 0:
+                # Otherwise, a collection ran during the iteration
+                stats.allocations.add(allocations)
+            for output_port in _midiout_ports.values():
+                stats.queue(output_port.name, len(output_port.events))
+
+        if deadline_scheduling:
+            timeout = _next_deadline(
+                next_click - position if is_playing else math.inf,
+                env.commands.nextDue() - position,
+                scheduler.nextDue() - position if is_playing else math.inf,
+                position
+            )
+            if _gc_suspended is not None and timeout >= gc_idle_margin:
+                timeout = max(timeout - _collect_young(), 0.0)
+            woken = clock.wait(env.wakeup, timeout)
+            env.wakeup.clear()
+        else:
+            timeout = min(max(time_res, 0), max_sleep)
+            clock.sleep(timeout)
+            woken = False
+        
+        if stats is not None and not woken:
+            # Oversleeping
+            stats.wakeup.add(time.perf_counter() - t_sleep - timeout)
 
 
 def play(
     what: Union[Track, str, Note, Seq, Generator, None] = None,
     channel: Optional[int] = None,
     instrument: Optional[int] = None,
-    loop: Optional[bool] = None
+    loop: Optional[bool] = None,
+    at: Optional[float] = None
 ):
     """
     Play a Track, a Sequence or a single Note.
@@ -490,12 +1221,14 @@ def play(
         instrument: int
             Instrument to play with (program change message)
         loop: boolean
-            Loop playback):
+            Loop playback
+        at: float
+            Engine position to start playing at, in time units
     """
     # print(f"play({what=}, {loop=})")
-    global _trigger_play
-    _trigger_play = True
     start_io()
+    env.commands.push(None, "play", at=at)
+    env.wakeup.set()
     
     if what:
         # Play solo track, seq or note
@@ -507,7 +1240,7 @@ def play(
                 what.channel = channel
             if instrument is not None:
                 what.instrument = instrument
-            what.start()
+            what.start(at=at)
             return
         
         track: Track = env.default_track
@@ -518,7 +1251,7 @@ def play(
         if instrument is not None:
             track.instrument = instrument
         track.clear()
-        track.start()
+        track.start(at=at)
         
         if isinstance(what, (str, Seq)):
             # what = Track(channel=channel, instrument=instrument, loop=loop)._addGen(genStr2seq, what)
@@ -533,15 +1266,405 @@ def play(
         for track in tracks:
             if loop is not None:
                 track.loop = loop
-            track.start()
+            track.start(at=at)
 
 
-def stop() -> None:
-    global _trigger_stop
-    _trigger_stop = True
+def stop(at: Optional[float] = None) -> None:
+    """
+    Stop every track
 
+    Args:
+        at: Engine position to stop at, in time units
+    """
     for track in tracks:
-        track.stop()
+        track.stop(at=at)
+    if env.commands.running:
+        env.commands.push(None, "stop", at=at)
+        env.wakeup.set()
+
+
+def setBpm(bpm: float, at: Optional[float] = None, ramp: float = 0.0) -> None:
+    """
+    Change tempo
+
+    Args:
+        at: Engine position of the tempo change, in time units
+        ramp: Duration of a linear tempo change, in time units (0 for a tempo step)
+    """
+    if env.commands.running:
+        # Applied to the tempo map as soon as possible, even when scheduled
+        env.commands.push(None, "bpm", (bpm, ramp, at))
+        env.wakeup.set()
+    elif at is None and ramp <= 0.0:
+        env.bpm = bpm
+    else:
+        # Positions restart from 0 when the engine starts
+        _tempo_map.setTempo(0.0 if at is None else at, bpm, ramp)
+
+
+def getPosition() -> float:
+    """Current engine position, in time units (1 second at 120 bpm)"""
+    return _position_at(clock.now())
+
+
+def render(
+        what: Union[Track, TrackGroup, List[Track]],
+        duration: float,
+        file: Optional[str] = None,
+        tempo_map: Optional[TempoMap] = None
+    ) -> List[tuple]:
+    """
+    Render tracks offline, as fast as possible, with a virtual clock.
+
+    Tracks are started from the beginning and are left stopped,
+    they shouldn't be playing live at the same time.
+    Messages still pending after 'duration' (note-offs) are included.
+
+    Args:
+        what: Track, TrackGroup or list of tracks to render
+        duration: Rendering duration, in time units (1 second at 120 bpm)
+        file: Path of a Standard MIDI File to write (optional)
+        tempo_map: Tempo changes and ramps (defaults to a constant 'env.bpm' tempo)
+
+    Returns:
+        Time ordered list of (time, midi message, port name), with time in seconds
+    """
+    if isinstance(what, Track):
+        to_start = [what]
+    else:
+        to_start = list(what)
+    if isinstance(what, TrackGroup):
+        track_list = what.priority_list
+    else:
+        track_list = []
+        for track in to_start:
+            track_list.extend(track._get_priority_list())
+    
+    # Offline replacements for every output port,
+    # tracks without a port don't open the default output
+    port_map: Dict[Optional[OutputPort], OutputPort] = dict()
+    for track in track_list:
+        port = track.port
+        if port not in port_map:
+            offline_port = OutputPort(None)
+            if port is None:
+                port = vars(env).get("default_output") # When already opened
+            if port is not None:
+                offline_port.name = port.name
+                offline_port.transpose = port.transpose
+            offline_port.captured = []
+            port_map[track.port] = offline_port
+    offline_ports = list(port_map.values())
+
+    for track in to_start:
+        track._start()
+    scheduler = TrackScheduler(track_list)
+
+    # Time jumps straight to the next event
+    now = 0.0
+    while True:
+        step = max(_time_to_next_event(offline_ports, scheduler.nextDue() - now, duration - now), 0.0)
+        now += step
+        for port in offline_ports:
+            port.process(now)
+        if now >= duration:
+            break
+        _update_tracks(scheduler, now, 0.0, port_map)
+    
+    for track in track_list:
+        track.stopped = True
+    
+    # Flush pending messages
+    while (step := _time_to_next_event(offline_ports, math.inf, math.inf)) < math.inf:
+        now += max(step, 0.0)
+        for port in offline_ports:
+            port.process(now)
+    
+    if tempo_map is None:
+        tempo_map = TempoMap(env.bpm)
+    time_at = tempo_map.timeAt
+    events = [
+        (time_at(t), mess, port.name)
+        for port in offline_ports for t, mess in port.captured
+    ]
+    events.sort(key=lambda e: e[0])
+
+    if file:
+        _write_midi_file(events, file, tempo_map)
+    
+    return events
+
+
+def _write_midi_file(events: List[tuple], filename: str, tempo_map: TempoMap) -> None:
+    """
+    Write rendered events to a Standard MIDI File, with a MIDI track per port.
+    Tempo changes are written to the first track, ramps as a tempo step every sixteenth note.
+    """
+    import mido
+
+    ticks_per_beat = 480
+    ticks_per_unit = ticks_per_beat * 2 # A beat is half a time unit
+    ramp_step = 0.125 # Sixteenth note, in time units
+    midi_file = mido.MidiFile(ticks_per_beat=ticks_per_beat)
+    midi_tracks = dict()
+    last_ticks = dict()
+
+    # Tempo track
+    tempo_track = mido.MidiTrack()
+    midi_file.tracks.append(tempo_track)
+    last_tick = 0
+    segments = list(tempo_map.segments())
+    for i, (position, t, bpm, slope) in enumerate(segments):
+        position = max(position, 0.0)
+        end = segments[i + 1][0] if i + 1 < len(segments) else position
+        steps = [position]
+        if slope != 0.0:
+            while steps[-1] + ramp_step < end:
+                steps.append(steps[-1] + ramp_step)
+        for p in steps:
+            if slope == 0.0:
+                tempo = mido.bpm2tempo(bpm)
+            else:
+                # Average tempo over the step, so step end times are exact
+                step = min(ramp_step, end - p)
+                tempo = round((tempo_map.timeAt(p + step) - tempo_map.timeAt(p)) / (step * 2) * 1e6)
+            tick = round(p * ticks_per_unit)
+            tempo_track.append(mido.MetaMessage("set_tempo", tempo=tempo, time=tick - last_tick))
+            last_tick = tick
+
+    position_at = tempo_map.positionAt
+    for t, mess, port_name in events:
+        if port_name not in midi_tracks:
+            midi_track = mido.MidiTrack()
+            midi_track.append(mido.MetaMessage("track_name", name=port_name))
+            midi_file.tracks.append(midi_track)
+            midi_tracks[port_name] = midi_track
+            last_ticks[port_name] = 0
+        if mess[0] & 0xf0 in (0xC0, 0xD0):
+            # Program change and channel aftertouch are 2 bytes long
+            mess = mess[:2]
+        ticks = round(position_at(t) * ticks_per_unit)
+        message = mido.Message.from_bytes(mess)
+        message.time = ticks - last_ticks[port_name]
+        last_ticks[port_name] = ticks
+        midi_tracks[port_name].append(message)
+    
+    midi_file.save(filename)
+
+
+def setBackend(name: str) -> None:
+    """
+    Backend of ports opened afterwards:
+    "rtmidi" (MIDI devices), "null" (messages are only counted),
+    "capture" (messages are kept in memory with their sending time),
+    "file" (raw MIDI bytes are written to the file named by the port)
+    or "bus" (in-process routing, see 'bus.MidiBus')
+    """
+    global port_backend
+    if name not in ("rtmidi", "null", "capture", "file", "bus"):
+        raise ValueError(f"Unknown backend '{name}'")
+    port_backend = name
+
+
+def setRealtime(enable=True) -> None:
+    """
+    Real-time playback mode, without garbage collection pauses.
+
+    When playback starts, garbage is collected and the remaining objects are frozen
+    ('gc.freeze'), so they are never scanned again. Automatic collection is then
+    suspended until playback stops: young objects are only collected when the IO thread
+    would sleep anyway (see 'gc_idle_margin').
+    Output ports reuse message buffers instead of allocating a list per sent message.
+
+    The number of objects still allocated per IO loop iteration is reported
+    by 'stats()', as "allocations".
+    """
+    global realtime
+    realtime = enable
+    if not enable:
+        _resume_gc()
+
+
+def _suspend_gc() -> None:
+    """
+    Collect garbage, freeze surviving objects and suspend automatic collection,
+    when not suspended yet (a full collection would pause a running playback)
+    """
+    global _gc_suspended
+    if _gc_suspended is not None:
+        return
+    _gc_suspended = gc.isenabled()
+    gc.disable()
+    gc.collect()
+    gc.freeze()
+
+
+def _resume_gc() -> None:
+    global _gc_suspended
+    if _gc_suspended is None:
+        return
+    gc.unfreeze()
+    if _gc_suspended:
+        gc.enable()
+    _gc_suspended = None
+
+
+def _collect_young() -> float:
+    """
+    Collect the young generations when they are over their threshold,
+    while automatic collection is suspended
+
+    Returns:
+        Time spent collecting, in seconds
+    """
+    count0, count1, _ = gc.get_count()
+    threshold0, threshold1, _ = gc.get_threshold()
+    if count0 < threshold0 and count1 < threshold1:
+        return 0.0
+    t = time.perf_counter()
+    gc.collect(1 if count1 >= threshold1 else 0)
+    return time.perf_counter() - t
+
+
+def setThreadedPorts(enable=True) -> None:
+    """
+    Give every opened output port (and ports opened afterwards)
+    a dedicated sender thread, so that a blocking port can't delay the other ones
+    """
+    global threaded_ports
+    threaded_ports = enable
+    for output_port in _midiout_ports.values():
+        output_port.setThreaded(enable)
+
+
+def setBandwidth(rate: Optional[float], burst: Optional[float] = None) -> None:
+    """
+    Limit the number of bytes sent per second by every opened output port
+    (and ports opened afterwards), None for no limit.
+    Notes are sent first, controller data is delayed and thinned when over budget.
+
+    Args:
+        rate: Budget in bytes per second ('DIN_BANDWIDTH' for a 5-pin DIN link)
+        burst: Number of bytes that can be sent at once
+    """
+    global bandwidth, bandwidth_burst
+    bandwidth = rate
+    bandwidth_burst = burst
+    for output_port in _midiout_ports.values():
+        output_port.setBandwidth(rate, burst)
+
+
+def setRedundantFilter(enable=True) -> None:
+    """
+    Drop program changes, controller, pitch bend and aftertouch messages
+    that wouldn't change the state of a device, on every opened output port
+    (and ports opened afterwards), to save bandwidth for notes
+    """
+    global filter_redundant
+    filter_redundant = enable
+    for output_port in _midiout_ports.values():
+        output_port.filter_redundant = enable
+
+
+def startRemote() -> None:
+    """
+    Send messages from a separate process, so that heavy work in the REPL
+    or in generators can't delay notes.
+    Sequences are still rendered in this process, 'lookahead' ahead of time.
+    """
+    global _remote
+    if _remote is not None:
+        return
+    if isinstance(clock, VirtualClock):
+        print("The remote process needs a real time clock")
+        return
+    from .remote import RemoteEngine
+    _remote = RemoteEngine()
+    _remote.start()
+    for output_port in _midiout_ports.values():
+        output_port.setRemote()
+
+
+def stopRemote() -> None:
+    """Send messages from this process again"""
+    global _remote
+    if _remote is None:
+        return
+    for output_port in _midiout_ports.values():
+        output_port.setRemote(False)
+    _remote.stop()
+    _remote = None
+
+
+def setClock(new_clock: Clock) -> None:
+    """
+    Replace the engine clock (a 'VirtualClock' lets the engine run as fast as possible).
+    The IO thread must be stopped.
+    """
+    global clock
+    if _is_running:
+        print("Stop the IO thread first")
+        return
+    clock = new_clock
+
+
+def enableStats(log_size=0) -> None:
+    """
+    Record timing measurements of the IO thread
+
+    Args:
+        log_size (int): Number of sent messages to keep in the rolling log
+    """
+    global _stats
+    _stats = TimingStats(log_size)
+
+
+def disableStats() -> None:
+    global _stats
+    _stats = None
+
+
+def stats() -> Optional[dict]:
+    """
+    Returns timing measurements of the IO thread, in milliseconds
+    (p50, p99 and max values of message latency, wake up delay,
+    loop duration, track update durations and queue sizes),
+    the number of objects allocated per IO loop iteration (see 'setRealtime'),
+    and the number of messages filtered out, dropped or delayed by output ports
+    (see 'setRedundantFilter' and 'setBandwidth'), the MIDI clock jitter,
+    the tempo followed by clock slave input ports, and the latency
+    and dropped events of the remote sender process (see 'startRemote')
+    """
+    if _stats is None:
+        print("Timing stats are disabled, call 'enableStats()' first")
+        return None
+    summary = _stats.summary()
+    summary["output"] = {
+        p.name: {
+            "filtered": p.filtered,
+            "dropped": p.limiter.dropped if p.limiter is not None else 0,
+            "delayed": p.limiter.delayed if p.limiter is not None else 0,
+        }
+        for p in _midiout_ports.values()
+    }
+    summary["midi_clock"] = {
+        p.name: p.midi_clock.jitter.summary()
+        for p in _midiout_ports.values() if p.midi_clock is not None
+    }
+    summary["clock_follower"] = {
+        p.name: {"bpm": p.clock_follower.bpm, "error": p.clock_follower.errors.summary()}
+        for p in _midiin_ports.values() if p.clock_follower is not None
+    }
+    if _remote is not None:
+        summary["remote"] = _remote.stats()
+    return summary
+
+
+def statsLog() -> list:
+    """Returns last sent messages as (intended_time, actual_time, port_name, message)"""
+    if _stats is None or _stats.log is None:
+        return []
+    return list(_stats.log)
 
 
 def panic() -> None:
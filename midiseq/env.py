@@ -1,8 +1,14 @@
 # !/usr/bin/env python3
 
+import threading
+
+from .commands import CommandQueue
+
+
 tracks = None
 default_track = None
 is_playing = False
+play_origin = 0.0 # Engine position playback was started at, origin of the bar grid
 
 bpm = 120
 note_dur = 1/4
@@ -19,10 +25,27 @@ METRONOME_CHAN = 9         # Midi channel for metronome
 
 # Settings
 
-default_output = None
+# default_output: opened on first use, see '__getattr__'
 default_input = None
 default_channel = 0
 
 display_notes = False
 display_range = (36, 96)
 verbose = False
+
+# Set to wake the IO thread before its next scheduled deadline
+wakeup = threading.Event()
+
+# Control commands applied by the IO thread, see 'CommandQueue'
+commands = CommandQueue()
+
+
+
+def __getattr__(name):
+    # Ports are opened on first use, so that importing midiseq has no side effects
+    if name == "default_output":
+        global default_output
+        from .engine import _default_output
+        default_output = _default_output()
+        return default_output
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,273 @@
+from typing import List, Tuple, Iterator, Optional
+from array import array
+import heapq
+import math
+
+from .ringbuffer import EventRing
+
+
+
+# Sort key layout, from most to least significant bits:
+# time (in ticks), message rank, run number (in insertion order), index of the event in its run.
+# Keys stay below 2**62 for the first 2**16 time units (18 hours at 120 bpm),
+# so they remain small Python integers
+TICKS = 1 << 16 # Ticks per time unit (15 us at 120 bpm)
+RUN_BITS = 16
+INDEX_BITS = 12
+RUN_MASK = (1 << RUN_BITS) - 1
+INDEX_MASK = (1 << INDEX_BITS) - 1
+RANK_SHIFT = INDEX_BITS + RUN_BITS
+TIME_SHIFT = RANK_SHIFT + 2
+MAX_RUN = 1 << INDEX_BITS # Larger batches are split into several runs
+
+
+def rank(packed: int) -> int:
+    """
+    Order of packed messages sent at the same time:
+    note-offs first, then other messages, then note-ons
+    """
+    kind = packed & 0xf0
+    if kind == 0x80 or (kind == 0x90 and (packed >> 16) & 0xff == 0):
+        return 0
+    if kind == 0x90:
+        return 2
+    return 1
+
+
+# Rank bits of sort keys, indexed by the high nibble of the status byte,
+# plus 1 for messages with a non-null velocity (see 'rank')
+_ORDERS = [ rank((i & 0xf0) | (i & 1) << 16) << RANK_SHIFT for i in range(256) ]
+
+
+
+class _Run:
+    """A batch of events (struct of arrays), with its sort keys in order"""
+
+    __slots__ = ("times", "messages", "keys", "next")
+
+    def __init__(self, times: array, messages: array, keys: List[int]) -> None:
+        self.times = times
+        self.messages = messages
+        self.keys = keys
+        self.next = 0 # Index of the next key to pop
+
+
+
+class EventQueue:
+    """
+    Time ordered queue of pending (time, midi message) events.
+
+    Every pushed batch is sorted once and kept as a run, with timestamps and
+    packed messages stored in arrays (struct of arrays).
+    Runs are merged lazily (k-way merge) as events are popped: the heap only holds
+    the integer sort key of each run head, so inserting a batch costs O(log k),
+    with k the number of pending runs, and long tails of future note-offs and
+    modulation events are never moved around.
+
+    Events pushed one at a time are gathered, and stored as a single run
+    when the queue is read.
+
+    Sort keys are integers, so equal times never compare Python objects:
+    ties are broken by message rank (see 'rank'), then by insertion order.
+    Runs are numbered in insertion order, pending runs are numbered again
+    when numbers run out.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[int] = [] # Sort keys of run heads
+        self._runs: List[Optional[_Run]] = [] # Runs by run number, None once popped
+        self._pushed: List[tuple] = [] # Events pushed one at a time, not stored as a run yet
+        self._size = 0
+        self.popped_time = 0.0 # Time of the last event removed by 'popInto'
+
+
+    def push(self, t: float, event) -> None:
+        self._pushed.append( (t, event) )
+        if len(self._pushed) >= MAX_RUN:
+            self._store_pushed()
+
+
+    def _store_pushed(self) -> None:
+        pushed, self._pushed = self._pushed, []
+        self._push_run(pushed, 0.0)
+
+
+    def pushMany(self, events: List[tuple], offset: float = 0.0) -> None:
+        """
+        Args:
+            events: list of (time, midi message), in any order
+            offset: added to event times
+        """
+        if len(events) <= MAX_RUN:
+            if events:
+                self._push_run(events, offset)
+            return
+        for start in range(0, len(events), MAX_RUN):
+            self._push_run(events[start:start + MAX_RUN], offset)
+
+
+    def _push_run(self, events, offset: float) -> None:
+        if not self._heap:
+            self._runs.clear()
+        elif len(self._runs) > RUN_MASK:
+            self._renumber()
+        run_number = len(self._runs)
+        self._runs.append(None)
+
+        times = [ t + offset for t, _ in events ]
+        messages = [
+            0x3000000 | e[0] | (e[1] << 8) | (e[2] << 16) if len(e) == 3 else EventRing.pack(e)
+            for _, e in events
+        ]
+        floor = math.floor
+        keys = [
+            (floor(t * TICKS) << TIME_SHIFT) | _ORDERS[(packed & 0xf0) | (packed & 0xff0000 != 0)] | index
+            # Run number and index in the run, low bits of the sort key
+            for t, packed, index in zip(
+                times, messages, range(run_number << INDEX_BITS, (run_number << INDEX_BITS) + len(times))
+            )
+        ]
+        keys.sort()
+
+        self._runs[run_number] = _Run(array('d', times), array('I', messages), keys)
+        heapq.heappush(self._heap, keys[0])
+        self._size += len(keys)
+
+
+    def _renumber(self) -> None:
+        """Number pending runs again from 0, keeping their order (lists are updated in place)"""
+        pending = [ run for run in self._runs if run is not None ]
+        if len(pending) > RUN_MASK:
+            raise OverflowError("Too many pending event batches")
+        clear = ~(RUN_MASK << INDEX_BITS)
+        for run_number, run in enumerate(pending):
+            number = run_number << INDEX_BITS
+            run.keys = [ key & clear | number for key in run.keys ]
+        self._runs[:] = pending
+        self._heap[:] = [ run.keys[run.next] for run in pending ]
+        heapq.heapify(self._heap)
+
+
+    def _advance(self, run: _Run, run_number: int) -> None:
+        """Replace the head of a run in the heap by its next event (inlined in 'popUntil')"""
+        run.next = i = run.next + 1
+        if i < len(run.keys):
+            heapq.heapreplace(self._heap, run.keys[i])
+        else:
+            heapq.heappop(self._heap)
+            self._runs[run_number] = None
+        self._size -= 1
+
+
+    def nextTime(self) -> float:
+        """Time of the earliest event, 'math.inf' when empty"""
+        if self._pushed:
+            self._store_pushed()
+        if not self._heap:
+            return math.inf
+        key = self._heap[0]
+        return self._runs[(key >> INDEX_BITS) & RUN_MASK].times[key & INDEX_MASK]
+
+
+    def pop(self) -> Tuple[float, List[int]]:
+        """Remove and return the earliest event"""
+        if self._pushed:
+            self._store_pushed()
+        key = self._heap[0]
+        run_number = (key >> INDEX_BITS) & RUN_MASK
+        run = self._runs[run_number]
+        i = key & INDEX_MASK
+        t = run.times[i]
+        packed = run.messages[i]
+        self._advance(run, run_number)
+        if packed >> 24 == 3:
+            return t, [packed & 0xff, (packed >> 8) & 0xff, (packed >> 16) & 0xff]
+        return t, EventRing.unpack(packed)
+
+
+    def popUntil(self, t: float) -> Iterator[Tuple[float, List[int]]]:
+        """Remove and yield every event due at time 't'"""
+        if self._pushed:
+            self._store_pushed()
+        heap = self._heap
+        runs = self._runs
+        while heap:
+            key = heap[0]
+            run_number = (key >> INDEX_BITS) & RUN_MASK
+            run = runs[run_number]
+            i = key & INDEX_MASK
+            event_time = run.times[i]
+            if event_time > t:
+                return
+            packed = run.messages[i]
+            run.next = next_key = run.next + 1
+            if next_key < len(run.keys):
+                heapq.heapreplace(heap, run.keys[next_key])
+            else:
+                heapq.heappop(heap)
+                runs[run_number] = None
+            self._size -= 1
+            if packed >> 24 == 3:
+                yield event_time, [packed & 0xff, (packed >> 8) & 0xff, (packed >> 16) & 0xff]
+            else:
+                yield event_time, EventRing.unpack(packed)
+            if self._pushed:
+                # Pushed while iterating
+                self._store_pushed()
+
+
+    def popInto(self, t: float, buffers: List[List[int]]) -> Optional[List[int]]:
+        """
+        Remove the earliest event if it is due at time 't', without allocating lists or tuples:
+        its message is written into 'buffers[n]' (a list of n bytes, for 1 to 3 bytes messages),
+        which is returned and is only valid until the next call.
+        The event time is kept in 'popped_time'.
+
+        Returns:
+            The message buffer, or None if no event is due
+        """
+        if self._pushed:
+            self._store_pushed()
+        heap = self._heap
+        if not heap:
+            return None
+        key = heap[0]
+        run_number = (key >> INDEX_BITS) & RUN_MASK
+        run = self._runs[run_number]
+        i = key & INDEX_MASK
+        if run.times[i] > t:
+            return None
+        self.popped_time = run.times[i]
+        packed = run.messages[i]
+        self._advance(run, run_number)
+        buffer = buffers[min(packed >> 24, 3)]
+        buffer[0] = packed & 0xff
+        if len(buffer) > 1:
+            buffer[1] = (packed >> 8) & 0xff
+            if len(buffer) > 2:
+                buffer[2] = (packed >> 16) & 0xff
+        return buffer
+
+
+    def clear(self) -> None:
+        self._pushed.clear()
+        self._heap.clear()
+        self._runs.clear()
+        self._size = 0
+
+
+    def __len__(self) -> int:
+        return self._size + len(self._pushed)
+
+
+    def __iter__(self) -> Iterator[Tuple[float, List[int]]]:
+        """Pending events, in time order"""
+        if self._pushed:
+            self._store_pushed()
+        keys = sorted(
+            key for run in self._runs if run is not None for key in run.keys[run.next:]
+        )
+        for key in keys:
+            run = self._runs[(key >> INDEX_BITS) & RUN_MASK]
+            i = key & INDEX_MASK
+            yield run.times[i], EventRing.unpack(run.messages[i])
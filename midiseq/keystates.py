@@ -0,0 +1,185 @@
+from typing import Optional, Iterator, Tuple, Set
+from array import array
+
+from rtmidi.midiconstants import (
+    NOTE_ON, NOTE_OFF, CONTROL_CHANGE, PROGRAM_CHANGE, PITCH_BEND,
+    CHANNEL_PRESSURE, POLY_PRESSURE,
+    BANK_SELECT_MSB, BANK_SELECT_LSB, RESET_ALL_CONTROLLERS,
+)
+
+
+
+class KeyStates:
+    """
+    Key state of every note of every midi channel,
+    with the set of active notes, so that releasing them costs O(active notes).
+
+    Notes are indexed by (channel << 7) | pitch.
+    """
+
+    def __init__(self) -> None:
+        self.onsets = array('d', [0.0]) * (16 * 128)
+        self.velocities = array('B', [0]) * (16 * 128)
+        self.active: Set[int] = set()
+
+
+    def update(self, t: float, event) -> Optional[Tuple[int, float, int]]:
+        """
+        Register note-on and note-off messages
+
+        Returns:
+            (index, onset time, velocity) of the released note, for note-offs of active notes
+        """
+        kind = event[0] & 0xf0
+        if kind != NOTE_ON and kind != NOTE_OFF:
+            return None
+        idx = ((event[0] & 0xf) << 7) | event[1]
+        if kind == NOTE_ON and event[2] > 0:
+            self.onsets[idx] = t
+            self.velocities[idx] = event[2]
+            self.active.add(idx)
+            return None
+
+        # Note-off, or note-on with a null velocity
+        if idx not in self.active:
+            return None
+        self.active.discard(idx)
+        velocity = self.velocities[idx]
+        self.velocities[idx] = 0
+        return idx, self.onsets[idx], velocity
+
+
+    def isActive(self, channel: int, pitch: int) -> bool:
+        return ((channel << 7) | pitch) in self.active
+
+
+    def activeNotes(self) -> Iterator[Tuple[int, int]]:
+        """Active notes, as (channel, pitch)"""
+        for idx in list(self.active):
+            yield idx >> 7, idx & 0x7f
+
+
+    def release(self) -> Iterator[Tuple[int, int]]:
+        """Unregister every active note, yields them as (channel, pitch)"""
+        active = self.active
+        while active:
+            idx = active.pop()
+            self.velocities[idx] = 0
+            yield idx >> 7, idx & 0x7f
+
+
+    def clear(self) -> None:
+        for idx in self.active:
+            self.velocities[idx] = 0
+        self.active.clear()
+
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+
+
+class ChannelStates:
+    """
+    Last value of program, controllers, pitch bend and aftertouch
+    sent on every midi channel, -1 when unknown.
+
+    Used to drop messages that wouldn't change the state of a device.
+    """
+
+    # Controllers that aren't plain values: bank select (resets program),
+    # data entry, (N)RPN selection and increments, channel mode messages
+    UNFILTERED_CC = frozenset([6, 38, 96, 97, 98, 99, 100, 101]) | frozenset(range(120, 128))
+
+    def __init__(self) -> None:
+        self.programs = array('h', [-1]) * 16
+        self.controllers = array('h', [-1]) * (16 * 128)
+        self.pitch_bends = array('i', [-1]) * 16
+        self.aftertouches = array('h', [-1]) * 16
+        self.poly_aftertouches = array('h', [-1]) * (16 * 128)
+
+
+    def update(self, event) -> bool:
+        """
+        Register a sent message
+
+        Returns:
+            False if the message doesn't change the channel state (redundant message)
+        """
+        kind = event[0] & 0xf0
+        channel = event[0] & 0xf
+
+        if kind == CONTROL_CHANGE:
+            controller = event[1]
+            if controller in self.UNFILTERED_CC:
+                if controller == RESET_ALL_CONTROLLERS:
+                    self._reset_controllers(channel)
+                return True
+            idx = (channel << 7) | controller
+            if self.controllers[idx] == event[2]:
+                return False
+            self.controllers[idx] = event[2]
+            if controller == BANK_SELECT_MSB or controller == BANK_SELECT_LSB:
+                # Program change must be sent again to select the new bank
+                self.programs[channel] = -1
+            return True
+        
+        if kind == PROGRAM_CHANGE:
+            if self.programs[channel] == event[1]:
+                return False
+            self.programs[channel] = event[1]
+            return True
+        
+        if kind == PITCH_BEND:
+            value = (event[2] << 7) | event[1]
+            if self.pitch_bends[channel] == value:
+                return False
+            self.pitch_bends[channel] = value
+            return True
+        
+        if kind == CHANNEL_PRESSURE:
+            if self.aftertouches[channel] == event[1]:
+                return False
+            self.aftertouches[channel] = event[1]
+            return True
+        
+        if kind == POLY_PRESSURE:
+            idx = (channel << 7) | event[1]
+            if self.poly_aftertouches[idx] == event[2]:
+                return False
+            self.poly_aftertouches[idx] = event[2]
+            return True
+        
+        return True
+
+
+    def forget(self, event) -> None:
+        """Forget the state registered for a message that was finally not sent"""
+        kind = event[0] & 0xf0
+        channel = event[0] & 0xf
+        if kind == CONTROL_CHANGE:
+            self.controllers[(channel << 7) | event[1]] = -1
+        elif kind == PROGRAM_CHANGE:
+            self.programs[channel] = -1
+        elif kind == PITCH_BEND:
+            self.pitch_bends[channel] = -1
+        elif kind == CHANNEL_PRESSURE:
+            self.aftertouches[channel] = -1
+        elif kind == POLY_PRESSURE:
+            self.poly_aftertouches[(channel << 7) | event[1]] = -1
+
+
+    def reset(self, channel: Optional[int] = None) -> None:
+        """Forget states (of a single channel, or of every channel)"""
+        channels = range(16) if channel is None else [channel]
+        for channel in channels:
+            self.programs[channel] = -1
+            self._reset_controllers(channel)
+
+
+    def _reset_controllers(self, channel: int) -> None:
+        self.pitch_bends[channel] = -1
+        self.aftertouches[channel] = -1
+        for idx in range(channel << 7, (channel + 1) << 7):
+            self.controllers[idx] = -1
+            self.poly_aftertouches[idx] = -1
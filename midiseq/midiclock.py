@@ -0,0 +1,196 @@
+from typing import Callable, List, Optional
+import threading
+
+from rtmidi.midiconstants import (
+    TIMING_CLOCK, SONG_START, SONG_CONTINUE, SONG_STOP, SONG_POSITION_POINTER,
+)
+
+from .stats import Histogram
+
+
+
+PPQN = 24
+TICK = 0.5 / PPQN # Duration of a clock tick, in time units (a beat is 0.5 time units)
+
+
+class MidiClock:
+    """
+    MIDI clock master, sends timing clock messages (24 per beat)
+    and start, stop and continue messages.
+
+    Ticks are sent from a dedicated thread, at absolute times computed from the engine
+    position, so their spacing doesn't depend on the work done by the IO thread.
+
+    Args:
+        send: Function sending a midi message
+        time_at: Function returning the clock time (in seconds) of an engine position
+        get_clock: Function returning the engine clock
+        margin: The thread wakes up this long (in seconds) before a tick,
+            then sleeps for the remaining time
+    """
+
+    def __init__(
+            self,
+            send: Callable[[List[int]], None],
+            time_at: Callable[[float], float],
+            get_clock: Callable,
+            margin: float = 0.002
+        ) -> None:
+        self._send = send
+        self._time_at = time_at
+        self._get_clock = get_clock
+        self.margin = margin
+        self.playing = False
+        self._origin = 0.0 # Engine position of the first tick
+        self._ticks = 0 # Number of ticks sent since start
+        self._messages: List[List[int]] = [] # Transport messages to send before the next tick
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.jitter = Histogram() # Delay between intended and actual tick sending times
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def start(self, position: float, song_position: int = 0) -> None:
+        """
+        Start sending ticks from an engine position
+
+        Args:
+            song_position: Number of sixteenth notes since the beginning of the song,
+                a song position pointer and a continue message are sent when not null
+        """
+        with self._lock:
+            if song_position:
+                self._messages.append(
+                    [SONG_POSITION_POINTER, song_position & 0x7f, (song_position >> 7) & 0x7f]
+                )
+                self._messages.append([SONG_CONTINUE])
+            else:
+                self._messages.append([SONG_START])
+            self._origin = position
+            self._ticks = 0
+            self.playing = True
+        self._wake.set()
+
+
+    def stop(self) -> None:
+        with self._lock:
+            if self.playing:
+                self._messages.append([SONG_STOP])
+            self.playing = False
+        self._wake.set()
+
+
+    def songPosition(self) -> int:
+        """Number of sixteenth notes since start (6 ticks each)"""
+        return self._ticks // 6
+
+
+    def wake(self) -> None:
+        """Compute the next tick time again (after a tempo change)"""
+        self._wake.set()
+
+
+    def close(self) -> None:
+        self.stop()
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+
+
+    def _run(self) -> None:
+        while self._running:
+            with self._lock:
+                messages, self._messages = self._messages, []
+                playing = self.playing
+                position = self._origin + self._ticks * TICK
+            for message in messages:
+                self._send(message)
+
+            clock = self._get_clock()
+            if not playing:
+                self._wake.wait(0.2)
+                self._wake.clear()
+                continue
+
+            t = self._time_at(position)
+            remaining = t - clock.now()
+            if remaining > self.margin:
+                # Wake up early, the tick time is computed again (the tempo may change)
+                if clock.wait(self._wake, min(remaining - self.margin, 0.2)):
+                    self._wake.clear()
+                continue
+            clock.sleep(remaining)
+
+            with self._lock:
+                if not self.playing or self._messages or position != self._origin + self._ticks * TICK:
+                    # Stopped or restarted in the meantime
+                    continue
+                self._ticks += 1
+            self._send([TIMING_CLOCK])
+            self.jitter.add(clock.now() - t)
+        
+        # Stop message, when closed
+        for message in self._messages:
+            self._send(message)
+
+
+
+class ClockFollower:
+    """
+    Tempo and phase estimation from incoming MIDI clock ticks (MIDI clock slave).
+
+    Tick arrival times are smoothed with an alpha-beta filter (a second order PLL),
+    so that jitter on incoming ticks doesn't make the tempo wobble.
+
+    Args:
+        bpm (float): Initial tempo estimate
+        alpha (float): Phase correction gain
+        beta (float): Period correction gain (defaults to the Benedict-Bordner gain,
+            alpha² / (2 - alpha), trading noise rejection against tracking of tempo changes)
+    """
+
+    def __init__(self, bpm: float = 120, alpha: float = 0.1, beta: Optional[float] = None) -> None:
+        self.alpha = alpha
+        self.beta = alpha * alpha / (2 - alpha) if beta is None else beta
+        self.period = 60 / (bpm * PPQN) # Estimated tick period, in seconds
+        self.ticks = 0 # Number of ticks received since start
+        self._next: Optional[float] = None # Predicted time of next tick
+        self.errors = Histogram() # Difference between predicted and actual tick times
+
+
+    @property
+    def bpm(self) -> float:
+        return 60 / (self.period * PPQN)
+
+
+    def tick(self, t: float) -> float:
+        """
+        Register a tick received at time 't' (in seconds)
+
+        Returns:
+            Filtered time of the tick
+        """
+        self.ticks += 1
+        if self._next is None:
+            self._next = t + self.period
+            return t
+        
+        error = t - self._next
+        self.errors.add(abs(error))
+        if abs(error) > self.period:
+            # Lost ticks or tempo jump, lock again on this tick
+            self._next = t + self.period
+            return t
+        
+        estimate = self._next + self.alpha * error
+        self.period += self.beta * error
+        self._next = estimate + self.period
+        return estimate
+
+
+    def reset(self) -> None:
+        """Count ticks from zero again, on song start (the tempo estimate is kept)"""
+        self.ticks = 0
+        self._next = None
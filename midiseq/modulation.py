@@ -197,7 +197,7 @@ class ModSeq():
         return self
     
 
-    def getMidiMessages(self, channel=0):
+    def getMidiMessages(self, channel=0, offset=0.0):
         messages = []
         for i in range(len(self.modulators)):
             # mod = self.modulators[i][0]
@@ -205,21 +205,21 @@ class ModSeq():
             values = self.values[i]
             # Only MSB is used for now
             if controler <= 0x7F:
-                messages.extend( [ (pos,
+                messages.extend( [ (pos + offset,
                                         [CONTROL_CHANGE|channel,
                                         controler,
                                         min(127, val2bytes(val)[0])]
                                     )
                                    for pos, val in values ] )
             elif controler == CHANNEL_AFTERTOUCH: # Status 0xD0
-                messages.extend( [ (pos,
+                messages.extend( [ (pos + offset,
                                         [CHANNEL_AFTERTOUCH|channel,
                                         val2bytes(val)[0],
                                         0]
                                     )
                                     for pos, val in values ] )
             elif controler == PITCH_BEND: # Status 0xE0
-                messages.extend( [ (pos,
+                messages.extend( [ (pos + offset,
                                         [PITCH_BEND|channel,
                                         0,
                                         min(127, val2bytes(val)[0])]
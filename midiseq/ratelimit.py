@@ -0,0 +1,128 @@
+from typing import Optional, Iterator, Dict, List
+import math
+
+from rtmidi.midiconstants import (
+    NOTE_ON, NOTE_OFF, PROGRAM_CHANGE, CHANNEL_PRESSURE, PITCH_BEND,
+)
+
+
+
+DIN_BANDWIDTH = 3125 # Bytes per second of a 5-pin DIN link (31250 bauds, 10 bits per byte)
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the number of bytes sent per second.
+
+    Notes and system messages are always sent right away (they can overdraw the budget).
+    Other messages (controllers, pitch bend, aftertouch, program changes)
+    are delayed when over budget, and only the last value of each controller
+    is kept while waiting, so dense streams are thinned.
+    Delayed messages of a channel are sent before its next note (see 'before'),
+    as the note depends on them (program, bank, pitch bend...).
+
+    Args:
+        rate (float): Budget, in bytes per second
+        burst (float): Number of bytes that can be sent at once (defaults to 10ms of budget)
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = max(3.0, rate / 100 if burst is None else burst)
+        self.tokens = self.burst
+        self._last = -math.inf
+        self._deferred: Dict[int, list] = dict() # Delayed messages, by controller
+        self.dropped = 0 # Messages replaced by a newer value before being sent
+        self.delayed = 0 # Messages sent later than scheduled
+
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+    def allow(self, event, now: float) -> bool:
+        """
+        Returns True if the message can be sent now,
+        otherwise the message is kept until the budget allows it (see 'due')
+
+        Args:
+            now: current time, in seconds
+        """
+        self._refill(now)
+        size = len(event)
+        kind = event[0] & 0xf0
+        if kind == NOTE_ON or kind == NOTE_OFF or kind == 0xf0:
+            self.tokens -= size
+            return True
+
+        if not self._deferred and self.tokens >= size:
+            self.tokens -= size
+            return True
+
+        if kind == PROGRAM_CHANGE or kind == CHANNEL_PRESSURE or kind == PITCH_BEND:
+            key = event[0]
+        else:
+            key = (event[0] << 8) | event[1]
+        if key in self._deferred:
+            self.dropped += 1
+        self._deferred[key] = event
+        return False
+
+
+    def before(self, event, now: float) -> List[list]:
+        """
+        Remove and return delayed messages to send before 'event', oldest first:
+        every delayed message of its channel when it's a note.
+        Like notes, they can overdraw the budget.
+
+        Args:
+            now: current time, in seconds
+        """
+        kind = event[0] & 0xf0
+        if not self._deferred or (kind != NOTE_ON and kind != NOTE_OFF):
+            return []
+        channel = event[0] & 0xf
+        keys = [ key for key, deferred in self._deferred.items() if deferred[0] & 0xf == channel ]
+        if not keys:
+            return []
+        self._refill(now)
+        messages = [ self._deferred.pop(key) for key in keys ]
+        for message in messages:
+            self.tokens -= len(message)
+        self.delayed += len(messages)
+        return messages
+
+
+    def due(self, now: float) -> Iterator[list]:
+        """Remove and yield delayed messages that can be sent now, oldest first"""
+        self._refill(now)
+        deferred = self._deferred
+        while deferred:
+            key = next(iter(deferred))
+            size = len(deferred[key])
+            if self.tokens < size:
+                break
+            self.tokens -= size
+            self.delayed += 1
+            yield deferred.pop(key)
+
+
+    def wait(self, now: float) -> float:
+        """Time until the next delayed message can be sent, in seconds"""
+        if not self._deferred:
+            return math.inf
+        size = len(next(iter(self._deferred.values())))
+        tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        return max((size - tokens) / self.rate, 0.0)
+
+
+    def clear(self) -> List[list]:
+        """Forget delayed messages, returns them"""
+        messages = list(self._deferred.values())
+        self._deferred.clear()
+        return messages
+
+
+    def __len__(self) -> int:
+        return len(self._deferred)
@@ -0,0 +1,158 @@
+from typing import List, Tuple, Dict, Optional, Callable, Union
+import threading
+import re
+
+
+
+PORT_NUMBER_PATTERN = re.compile(r"\s+\d+(:\d+)?$")
+
+
+def portKey(name: str) -> str:
+    """
+    Port name without the port number appended by rtmidi
+    (ALSA client:port address, or Windows port index),
+    which may change when a device is plugged in again
+    """
+    return PORT_NUMBER_PATTERN.sub("", name)
+
+
+def _list_rtmidi_ports(state: dict) -> Tuple[List[str], List[str]]:
+    """Names of rtmidi output and input ports, enumerated with long-lived MidiOut and MidiIn objects"""
+    if not state:
+        import rtmidi
+        state["out"] = rtmidi.MidiOut()
+        state["in"] = rtmidi.MidiIn()
+    midiout, midiin = state["out"], state["in"]
+    return (
+        [ midiout.get_port_name(i) for i in range(midiout.get_port_count()) ],
+        [ midiin.get_port_name(i) for i in range(midiin.get_port_count()) ],
+    )
+
+
+
+class PortRegistry:
+    """
+    Cached lists of MIDI output and input ports.
+
+    Ports are enumerated on first use, then on 'refresh' or by a background
+    watcher thread (see 'watch'), so looking a port up doesn't query the MIDI API.
+    Lookups by number or name are cached as well, until the next change.
+
+    Args:
+        lister: Function returning the (output names, input names) lists
+            (defaults to rtmidi enumeration)
+    """
+
+    def __init__(self, lister: Optional[Callable[[], Tuple[List[str], List[str]]]] = None) -> None:
+        if lister is None:
+            state = dict()
+            lister = lambda: _list_rtmidi_ports(state)
+        self._lister = lister
+        self._lock = threading.Lock()
+        self._ports: Optional[Dict[str, List[str]]] = None # Port names, by kind ("output" or "input")
+        self._lookups: Dict[tuple, str] = dict() # Port name, by (kind, port number or name)
+        self._listeners: List[Callable] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+
+    def refresh(self) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        Enumerate ports again, listeners are called if ports were added or removed
+
+        Returns:
+            Added and removed ports, as lists of (kind, port name)
+        """
+        with self._lock:
+            outputs, inputs = self._lister()
+            ports = { "output": outputs, "input": inputs }
+            added, removed = [], []
+            if self._ports is not None:
+                for kind, names in ports.items():
+                    previous = set(self._ports[kind])
+                    added.extend( (kind, name) for name in names if name not in previous )
+                    removed.extend( (kind, name) for name in previous if name not in names )
+            if added or removed or self._ports is None:
+                # Replaced rather than cleared, for readers in other threads
+                self._ports = ports
+                self._lookups = dict()
+
+        if added or removed:
+            for listener in list(self._listeners):
+                listener(added, removed)
+        return added, removed
+
+
+    def ports(self, kind: str) -> List[str]:
+        """Port names, 'kind' is "output" or "input" """
+        ports = self._ports
+        if ports is None:
+            self.refresh()
+            ports = self._ports
+        return ports[kind]
+
+
+    def find(self, kind: str, port_id: Union[int, str]) -> Optional[str]:
+        """
+        Name of a port, by number or by name (case insensitive substring),
+        None if not found (ports are enumerated again before giving up)
+        """
+        key = (kind, port_id)
+        name = self._lookups.get(key)
+        if name is not None:
+            return name
+
+        name = self._find(self.ports(kind), port_id)
+        if name is None:
+            # Maybe plugged in since last enumeration
+            self.refresh()
+            name = self._find(self.ports(kind), port_id)
+        if name is not None:
+            self._lookups[key] = name
+        return name
+
+
+    @staticmethod
+    def _find(names: List[str], port_id: Union[int, str]) -> Optional[str]:
+        if isinstance(port_id, int):
+            return names[port_id] if 0 <= port_id < len(names) else None
+        query = port_id.lower()
+        for name in names:
+            if query in name.lower():
+                return name
+        return None
+
+
+    def addListener(self, listener: Callable[[list, list], None]) -> None:
+        """Call 'listener(added, removed)' when ports are added or removed (see 'refresh')"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+
+    def removeListener(self, listener: Callable[[list, list], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+
+    def watch(self, interval: Optional[float] = 1.0) -> None:
+        """
+        Enumerate ports every 'interval' seconds from a background thread,
+        to detect plugged and unplugged devices (None to stop watching)
+        """
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+        if interval is None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Port watcher: {e}")
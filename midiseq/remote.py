@@ -0,0 +1,181 @@
+from typing import List
+import multiprocessing as mp
+import threading
+import heapq
+import time
+
+from rtmidi.midiconstants import NOTE_ON, NOTE_OFF
+
+from .ringbuffer import EventRing, SharedRing
+from .eventqueue import rank
+from .stats import Histogram
+
+
+
+class RemoteEngine:
+    """
+    Sends midi messages from a separate process, so that the REPL and
+    heavy generators can't delay them (they don't share the GIL).
+
+    Events are passed through a shared memory ring per port,
+    with absolute 'time.perf_counter' timestamps.
+    Rings have a single producer, so pushes to a ring are serialised
+    (the IO thread, the MIDI clock thread and rtmidi's callback thread may push).
+    Commands go through a pipe.
+
+    Args:
+        capacity (int): Number of pending events per port ring
+        put_timeout (float): Longest time to wait for room in a full ring
+            before dropping an event, in seconds
+    """
+
+    def __init__(self, capacity=4096, max_sleep=0.2, put_timeout=0.1) -> None:
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._lock = threading.Lock() # Pipe connections aren't thread safe
+        self.process = ctx.Process(target=_serve, args=(child_conn, max_sleep), daemon=True)
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.rings: List[SharedRing] = []
+        self._ring_locks: List[threading.Lock] = [] # Held while writing to a ring, by port index
+        self.dropped = 0 # Events lost because a ring was full
+
+
+    def start(self) -> None:
+        """Start the remote process and wait until it is ready"""
+        self.process.start()
+        self._conn.recv()
+
+
+    def _send(self, *command) -> None:
+        with self._lock:
+            self._conn.send(command)
+
+
+    def openPort(self, port_name: str) -> int:
+        """Open an output port in the remote process, returns its index"""
+        ring = SharedRing(self.capacity)
+        self._ring_locks.append(threading.Lock())
+        self.rings.append(ring)
+        index = len(self.rings) - 1
+        self._send("open", index, port_name, ring.name, self.capacity)
+        return index
+
+
+    def push(self, index: int, t: float, message, wake=True) -> None:
+        """
+        Queue a message to be sent at 't' ('time.perf_counter' time).
+        When the ring is full, waits for the remote process to empty it
+        (up to 'put_timeout'), rather than dropping the message
+        """
+        ring = self.rings[index]
+        packed = EventRing.pack(message)
+        with self._ring_locks[index]:
+            if not ring.put(t, packed):
+                # The remote process moves ring records to its own queue when woken
+                self.wake()
+                deadline = time.perf_counter() + self.put_timeout
+                while not ring.put(t, packed):
+                    if time.perf_counter() > deadline:
+                        self.dropped += 1
+                        break
+                    time.sleep(0.0005)
+        if wake:
+            self.wake()
+
+
+    def wake(self) -> None:
+        """Tell the remote process new events are waiting"""
+        self._send("wake")
+
+
+    def cancel(self, index: int) -> None:
+        """Drop every event of a port pushed so far"""
+        written, _ = self.rings[index].counts()
+        self._send("cancel", index, written)
+
+
+    def panic(self, index: int) -> None:
+        """Send note off messages for every active note of a port"""
+        self._send("panic", index)
+
+
+    def stats(self) -> dict:
+        """Message latency by port, measured in the remote process, and number of dropped events"""
+        with self._lock:
+            self._conn.send( ("stats",) )
+            latency = self._conn.recv()
+        return { "ports": latency, "dropped": self.dropped }
+
+
+    def stop(self) -> None:
+        self._send("quit")
+        self.process.join()
+        for ring in self.rings:
+            ring.close(unlink=True)
+        self.rings.clear()
+        self._ring_locks.clear()
+
+
+
+def _serve(conn, max_sleep: float) -> None:
+    """Remote process main loop"""
+    from rtmidi.midiutil import open_midioutput
+
+    ports = [] # List of [port name, midiout, ring, heap, active_notes, latency histogram]
+    running = True
+    conn.send("ready")
+
+    while running:
+        # Sleep until the next due event or the next command
+        timeout = max_sleep
+        now = time.perf_counter()
+        for _, _, _, heap, _, _ in ports:
+            if heap:
+                timeout = min(timeout, heap[0][0] - now)
+
+        while conn.poll(max(timeout, 0.0)):
+            timeout = 0.0
+            command, *args = conn.recv()
+            if command == "open":
+                index, port_name, ring_name, capacity = args
+                midiout, _ = open_midioutput(port_name)
+                ring = SharedRing(capacity, name=ring_name)
+                ports.append( [port_name, midiout, ring, [], set(), Histogram()] )
+            elif command == "cancel":
+                index, until = args
+                _, _, ring, heap, _, _ = ports[index]
+                ring.discard(until)
+                heap[:] = [ e for e in heap if e[2] >= until ]
+                heapq.heapify(heap)
+            elif command == "panic":
+                _, midiout, _, _, active_notes, _ = ports[args[0]]
+                for status, pitch in active_notes:
+                    midiout.send_message( [NOTE_OFF | (status & 0xf), pitch, 0] )
+                active_notes.clear()
+            elif command == "stats":
+                conn.send({ p[0]: p[5].summary() for p in ports })
+            elif command == "quit":
+                running = False
+
+        for _, midiout, ring, heap, active_notes, latency in ports:
+            _, seq = ring.counts()
+            for t, packed in ring.get():
+                # Records are ordered by time, note-offs first, then by arrival
+                heapq.heappush(heap, (t, rank(packed), seq, packed))
+                seq += 1
+            while heap and heap[0][0] <= time.perf_counter():
+                t, _, _, packed = heapq.heappop(heap)
+                message = EventRing.unpack(packed)
+                midiout.send_message(message)
+                latency.add(time.perf_counter() - t)
+
+                status = message[0] & 0xf0
+                if status == NOTE_ON and message[2] > 0:
+                    active_notes.add( (message[0], message[1]) )
+                elif status in (NOTE_ON, NOTE_OFF):
+                    active_notes.discard( (NOTE_ON | (message[0] & 0xf), message[1]) )
+
+    for _, midiout, ring, _, _, _ in ports:
+        midiout.close_port()
+        ring.close()
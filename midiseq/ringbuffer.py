@@ -0,0 +1,177 @@
+from typing import Optional, Iterator, List, Tuple
+from array import array
+import struct
+
+
+
+class EventRing:
+    """
+    Fixed capacity ring buffer of timestamped raw midi messages (up to 3 bytes long).
+    When full, the oldest events are dropped, or written to a spill file first.
+
+    Args:
+        capacity (int): Maximum number of events kept in memory
+        spill (str): Path of an append-only file where dropped events are saved (optional)
+    """
+
+    # Spill file record: timestamp and packed message
+    record = struct.Struct("<dI")
+
+    def __init__(self, capacity=65536, spill: Optional[str] = None) -> None:
+        self.capacity = capacity
+        self.times = array('d', [0.0]) * capacity
+        self.messages = array('I', [0]) * capacity
+        self._start = 0
+        self._size = 0
+        self.count = 0 # Total number of events appended
+        self._spill = None
+        if spill:
+            self.spillTo(spill)
+
+
+    @staticmethod
+    def pack(message) -> int:
+        """Pack a midi message in a single integer, message length in most significant byte"""
+        packed = len(message) << 24
+        for i, byte in enumerate(message[:3]):
+            packed |= byte << (8 * i)
+        return packed
+
+
+    @staticmethod
+    def unpack(packed: int) -> List[int]:
+        return [ (packed >> (8 * i)) & 0xff for i in range(min(packed >> 24, 3)) ]
+
+
+    def spillTo(self, filename: Optional[str]) -> None:
+        """Save dropped events to an append-only file (None to stop spilling)"""
+        if self._spill:
+            self._spill.close()
+        self._spill = open(filename, 'ab') if filename else None
+
+
+    def append(self, t: float, message) -> None:
+        if self._size < self.capacity:
+            i = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            # Buffer is full, overwrite oldest event
+            i = self._start
+            if self._spill:
+                self._spill.write(self.record.pack(self.times[i], self.messages[i]))
+            self._start = (self._start + 1) % self.capacity
+        self.times[i] = t
+        self.messages[i] = self.pack(message)
+        self.count += 1
+
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+
+    def close(self) -> None:
+        """Flush events still in memory to the spill file and close it"""
+        if self._spill:
+            for t, message in self:
+                self._spill.write(self.record.pack(t, self.pack(message)))
+            self._spill.close()
+            self._spill = None
+        self.clear()
+
+
+    @classmethod
+    def load(cls, filename: str) -> Iterator[Tuple[float, List[int]]]:
+        """Read events back from a spill file"""
+        with open(filename, 'rb') as f:
+            for t, packed in cls.record.iter_unpack(f.read()):
+                yield t, cls.unpack(packed)
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __getitem__(self, index: int) -> Tuple[float, List[int]]:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("EventRing index out of range")
+        i = (self._start + index) % self.capacity
+        return self.times[i], self.unpack(self.messages[i])
+
+
+    def __iter__(self) -> Iterator[Tuple[float, List[int]]]:
+        for index in range(self._size):
+            i = (self._start + index) % self.capacity
+            yield self.times[i], self.unpack(self.messages[i])
+
+
+
+class SharedRing:
+    """
+    Single producer, single consumer ring buffer of (time, packed message) records,
+    in shared memory, to pass events between processes without locking.
+
+    Args:
+        capacity (int): Maximum number of pending records
+        name (str): Name of an existing shared memory block to attach to (optional)
+    """
+
+    header = struct.Struct("<QQ") # Write count, read count
+    record = EventRing.record
+
+    def __init__(self, capacity=4096, name: Optional[str] = None) -> None:
+        from multiprocessing import shared_memory
+
+        size = self.header.size + capacity * self.record.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.header.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.capacity = capacity
+
+
+    def put(self, t: float, packed: int) -> bool:
+        """Producer side, returns False if the ring is full"""
+        buf = self.shm.buf
+        written, read = self.header.unpack_from(buf, 0)
+        if written - read >= self.capacity:
+            return False
+        offset = self.header.size + (written % self.capacity) * self.record.size
+        self.record.pack_into(buf, offset, t, packed)
+        # Publish the record only once it is written
+        struct.pack_into("<Q", buf, 0, written + 1)
+        return True
+
+
+    def get(self) -> List[Tuple[float, int]]:
+        """Consumer side, returns every available record"""
+        buf = self.shm.buf
+        written, read = self.header.unpack_from(buf, 0)
+        records = []
+        while read < written:
+            offset = self.header.size + (read % self.capacity) * self.record.size
+            records.append(self.record.unpack_from(buf, offset))
+            read += 1
+        struct.pack_into("<Q", buf, 8, read)
+        return records
+
+
+    def counts(self) -> Tuple[int, int]:
+        """Returns the number of records written and read so far"""
+        return self.header.unpack_from(self.shm.buf, 0)
+
+
+    def discard(self, until: int) -> None:
+        """Consumer side, skip records up to the 'until' write count"""
+        written, read = self.header.unpack_from(self.shm.buf, 0)
+        struct.pack_into("<Q", self.shm.buf, 8, max(read, min(until, written)))
+
+
+    def close(self, unlink=False) -> None:
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
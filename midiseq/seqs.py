@@ -1,4 +1,5 @@
 import random
+import sys
 
 import midiseq.env as env
 from .elements import Note, Sil, Seq, Scl, Chord
@@ -11,13 +12,24 @@ from .definitions import *
 ####                           Example sequences                           ####
 ###############################################################################
 
+# Parsed sequences are built on first access (see '__getattr__'),
+# so that importing midiseq stays fast
+_examples = dict()
 
-seq_kaini_industries = Seq("""
-    -g#%1.5 -a#%.5 b_b -g#_b -g#_a# f#_-g# -2b -g#_-f#
-    c# -c#%4 f#%2 g#
-    -2g#%1.5 -a#_d# -a#_d# -a#_-f# f#_f# -a#_f# g#%.5 g#
-    -c# -d#_e# -d# e# b e#_b e#_a# f#
-    """)
+
+def _example(func):
+    _examples[func.__name__[1:]] = func
+    return func
+
+
+@_example
+def _seq_kaini_industries():
+    return Seq("""
+        -g#%1.5 -a#%.5 b_b -g#_b -g#_a# f#_-g# -2b -g#_-f#
+        c# -c#%4 f#%2 g#
+        -2g#%1.5 -a#_d# -a#_d# -a#_-f# f#_f# -a#_f# g#%.5 g#
+        -c# -d#_e# -d# e# b e#_b e#_a# f#
+        """)
 
 seq_mario = "e_e ._e ._c e_. g . -g"
 
@@ -37,11 +49,34 @@ seq_sunburn = seq_sunburn1*2 + seq_sunburn2*2
 
 # https://www.youtube.com/watch?v=2aA72rBmWFQ
 # Played at 110 bpm
-seq_freya_theme1 = lcm("d%3 a%2 .", "+a%2 +f%2")
-seq_freya_theme2 = lcm("c%3 a%2 .", "[+a%2 +2e%2] +e%2")
-seq_freya_theme3 = lcm("-a#%3 a%2 .", "[+a%2 +2d%2] +d%2")
-seq_freya_theme4 = lcm("g%3 +d%2 .", "[+a#%2 +2d%2] +g%2")
-seq_freya_theme = seq_freya_theme1*4 + seq_freya_theme2*4 + seq_freya_theme3*4 + seq_freya_theme4*4
+@_example
+def _seq_freya_theme1():
+    return lcm("d%3 a%2 .", "+a%2 +f%2")
+
+@_example
+def _seq_freya_theme2():
+    return lcm("c%3 a%2 .", "[+a%2 +2e%2] +e%2")
+
+@_example
+def _seq_freya_theme3():
+    return lcm("-a#%3 a%2 .", "[+a%2 +2d%2] +d%2")
+
+@_example
+def _seq_freya_theme4():
+    return lcm("g%3 +d%2 .", "[+a#%2 +2d%2] +g%2")
+
+@_example
+def _seq_freya_theme():
+    m = sys.modules[__name__] # Parts are built on first access as well
+    return m.seq_freya_theme1*4 + m.seq_freya_theme2*4 + m.seq_freya_theme3*4 + m.seq_freya_theme4*4
+
+
+def __getattr__(name):
+    if name in _examples:
+        value = _examples[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 # https://www.youtube.com/watch?v=m3X-XEjTqz4
 seq_4tet_green1 = """
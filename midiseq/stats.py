@@ -0,0 +1,123 @@
+from typing import Dict, Optional, List
+from collections import deque, defaultdict
+
+
+
+class Histogram:
+    """
+    Rolling window of measured durations (in seconds)
+
+    Args:
+        size (int): Number of values kept to compute percentiles
+    """
+
+    def __init__(self, size=4096) -> None:
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.max = 0.0
+
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+    def percentile(self, p: float) -> float:
+        if not self.values:
+            return 0.0
+        values = sorted(self.values)
+        return values[min(int(len(values) * p), len(values) - 1)]
+
+
+    def summary(self) -> dict:
+        """Returns count, p50, p99 and max values, in milliseconds"""
+        return {
+            "count": self.count,
+            "p50": self.percentile(0.5) * 1000,
+            "p99": self.percentile(0.99) * 1000,
+            "max": self.max * 1000,
+        }
+
+
+    def clear(self) -> None:
+        self.values.clear()
+        self.count = 0
+        self.max = 0.0
+
+
+
+class TimingStats:
+    """
+    Timing measurements of the IO thread
+
+    Attributes:
+        latency: delay between the intended and the actual sending time of messages
+        ports: message latency, by port name
+        wakeup: delay between the intended and the actual wake up time of the IO thread
+        loop: duration of IO loop iterations
+        tracks: duration of 'Track.update' calls, by track name
+        queues: number of pending events, by port name
+        allocations: net number of objects tracked by the garbage collector,
+            allocated by IO loop iterations
+        log: last messages sent, as (intended_time, actual_time, port_name, message)
+    """
+
+    def __init__(self, log_size=0) -> None:
+        self.latency = Histogram()
+        self.ports: Dict[str, Histogram] = defaultdict(Histogram)
+        self.wakeup = Histogram()
+        self.loop = Histogram()
+        self.tracks: Dict[str, Histogram] = defaultdict(Histogram)
+        self.queues: Dict[str, Histogram] = defaultdict(Histogram)
+        self.allocations = Histogram()
+        self.log: Optional[deque] = deque(maxlen=log_size) if log_size > 0 else None
+
+
+    def message(self, port_name: str, intended: float, actual: float, message: List[int]) -> None:
+        self.latency.add(actual - intended)
+        self.ports[port_name].add(actual - intended)
+        if self.log is not None:
+            self.log.append( (intended, actual, port_name, list(message)) )
+
+
+    def track(self, track, duration: float) -> None:
+        self.tracks[track.name or hex(id(track))].add(duration)
+
+
+    def queue(self, port_name: str, size: int) -> None:
+        # Queue sizes are stored as is, not as durations
+        self.queues[port_name].add(size)
+
+
+    def summary(self) -> dict:
+        return {
+            "latency": self.latency.summary(),
+            "ports": { name: h.summary() for name, h in self.ports.items() },
+            "wakeup": self.wakeup.summary(),
+            "loop": self.loop.summary(),
+            "tracks": { name: h.summary() for name, h in self.tracks.items() },
+            "queues": {
+                name: {"count": h.count, "p50": h.percentile(0.5), "max": h.max}
+                for name, h in self.queues.items()
+            },
+            "allocations": {
+                "count": self.allocations.count,
+                "p50": self.allocations.percentile(0.5),
+                "p99": self.allocations.percentile(0.99),
+                "max": self.allocations.max,
+            },
+        }
+
+
+    def clear(self) -> None:
+        self.latency.clear()
+        self.ports.clear()
+        self.wakeup.clear()
+        self.loop.clear()
+        self.tracks.clear()
+        self.queues.clear()
+        self.allocations.clear()
+        if self.log is not None:
+            self.log.clear()
@@ -0,0 +1,165 @@
+from typing import List, Tuple, Iterator
+from bisect import bisect_right
+import math
+
+
+
+class TempoMap:
+    """
+    Tempo curve, converting engine positions (in time units) to clock times (in seconds)
+    and back, exactly.
+
+    The curve is made of segments starting at given positions, with either a constant
+    tempo or a tempo changing linearly with position (ramp), so both conversions
+    have a closed form (logarithm and exponential for ramps).
+    Segment start positions and times are precomputed, lookups bisect them (O(log n)).
+
+    Tables are replaced as a whole when the curve changes, so other threads
+    can convert times while the IO thread changes tempo.
+
+    Args:
+        bpm (float): Initial tempo
+        t (float): Clock time of the anchor, in seconds
+        position (float): Engine position of the anchor, in time units
+    """
+
+    def __init__(self, bpm: float = 120, t: float = 0.0, position: float = 0.0) -> None:
+        self._changes: List[Tuple[float, float, float]] = [] # Tempo changes, as (position, bpm, ramp)
+        self.reset(t, position, bpm)
+
+
+    def reset(self, t: float, position: float, bpm: float) -> None:
+        """Forget every tempo change, constant tempo from an anchor"""
+        self._anchor = (t, position, bpm)
+        self._changes = []
+        self._build()
+
+
+    def moveAnchor(self, t: float, position: float, bpm: float) -> None:
+        """Constant tempo from a new anchor, until the tempo changes after it (which are kept)"""
+        self._anchor = (t, position, bpm)
+        self._changes = [ c for c in self._changes if c[0] >= position ]
+        self._build()
+
+
+    def setTempo(self, position: float, bpm: float, ramp: float = 0.0) -> None:
+        """
+        Change tempo at a given position, later tempo changes are kept
+
+        Args:
+            position: Engine position of the change, in time units
+            ramp: Duration of a linear tempo change, in time units (0 for a tempo step)
+        """
+        position = max(position, self._anchor[1]) # Changes before the anchor are applied at the anchor
+        i = bisect_right([ c[0] for c in self._changes ], position)
+        # A new change at the same position replaces the previous one
+        if i > 0 and self._changes[i - 1][0] == position:
+            i -= 1
+            del self._changes[i]
+        self._changes.insert(i, (position, bpm, ramp))
+        self._build()
+
+
+    def trim(self, position: float) -> None:
+        """Forget segments ending before a position, as the engine won't go back"""
+        positions, times, bpms, _ = self._table
+        i = bisect_right(positions, position) - 1
+        if i <= 0:
+            return
+        self._anchor = (times[i], positions[i], bpms[i])
+        self._changes = [ c for c in self._changes if c[0] >= positions[i] ]
+        self._build()
+
+
+    def _build(self) -> None:
+        """Precompute segment tables from the anchor and tempo changes"""
+        t, position, bpm = self._anchor
+        positions = [position]
+        times = [t]
+        bpms = [bpm]
+        slopes = [0.0] # Tempo change per time unit
+
+        def append(p: float, target_bpm: float, slope: float) -> None:
+            # Start a new segment at position 'p', after the last one
+            if p == positions[-1]:
+                # The last segment would be empty, replace it
+                bpms[-1] = target_bpm
+                slopes[-1] = slope
+                return
+            last = len(positions) - 1
+            positions.append(p)
+            times.append(self._segment_time(positions[last], times[last], bpms[last], slopes[last], p))
+            bpms.append(target_bpm)
+            slopes.append(slope)
+
+        for p, target_bpm, ramp in self._changes:
+            if p < positions[-1] and len(positions) > 1 and slopes[-2] != 0.0:
+                # In the middle of a ramp, the ramp is interrupted
+                for table in (positions, times, bpms, slopes):
+                    table.pop()
+            p = max(p, positions[-1])
+            current_bpm = bpms[-1] + slopes[-1] * (p - positions[-1])
+            if ramp > 0.0 and target_bpm != current_bpm:
+                append(p, current_bpm, (target_bpm - current_bpm) / ramp)
+                append(p + ramp, target_bpm, 0.0)
+            else:
+                append(p, target_bpm, 0.0)
+
+        self._table = (positions, times, bpms, slopes)
+
+
+    @staticmethod
+    def _segment_time(p0: float, t0: float, bpm: float, slope: float, position: float) -> float:
+        dp = position - p0
+        if slope == 0.0:
+            return t0 + dp * 120 / bpm
+        # Integral of 120 / (bpm + slope * dp)
+        return t0 + 120 / slope * math.log1p(slope * dp / bpm)
+
+
+    def timeAt(self, position: float) -> float:
+        """Clock time (in seconds) of an engine position"""
+        positions, times, bpms, slopes = self._table
+        i = bisect_right(positions, position) - 1
+        if i < 0:
+            # Before the anchor, at the anchor tempo
+            return times[0] + (position - positions[0]) * 120 / bpms[0]
+        return self._segment_time(positions[i], times[i], bpms[i], slopes[i], position)
+
+
+    def positionAt(self, t: float) -> float:
+        """Engine position (in time units) at a clock time"""
+        positions, times, bpms, slopes = self._table
+        i = bisect_right(times, t) - 1
+        if i < 0:
+            return positions[0] + (t - times[0]) * bpms[0] / 120
+        dt = t - times[i]
+        slope = slopes[i]
+        if slope == 0.0:
+            return positions[i] + dt * bpms[i] / 120
+        return positions[i] + bpms[i] * math.expm1(slope * dt / 120) / slope
+
+
+    def bpmAt(self, position: float) -> float:
+        """Tempo at an engine position"""
+        positions, _, bpms, slopes = self._table
+        i = max(bisect_right(positions, position) - 1, 0)
+        if slopes[i] == 0.0:
+            return bpms[i]
+        return bpms[i] + slopes[i] * (max(position, positions[i]) - positions[i])
+
+
+    def nextChange(self, position: float) -> float:
+        """Position of the next segment start after 'position', 'math.inf' if none"""
+        positions = self._table[0]
+        i = bisect_right(positions, position)
+        return positions[i] if i < len(positions) else math.inf
+
+
+    def segments(self) -> Iterator[Tuple[float, float, float, float]]:
+        """Segments, as (position, time, bpm, tempo change per time unit)"""
+        return zip(*self._table)
+
+
+    def __len__(self) -> int:
+        return len(self._table[0])
@@ -1,11 +1,14 @@
 from __future__ import annotations
-from typing import List, Union, Generator, Optional, Callable, Tuple
+from typing import List, Union, Generator, Optional, Callable, Tuple, Dict, Iterator
+import heapq
+import math
 
 from rtmidi.midiconstants import (
     PROGRAM_CHANGE,
 )
 
 from .elements import Seq, parse
+import midiseq.env as env
 
 
 class Track():
@@ -38,6 +41,9 @@ class Track():
         # self.shuffle = False
         self.offset = 0.0        
         self.send_program_change = True
+        self._next_timer = 0.0
+        self._fresh_start = False
+        self._start_position = 0.0 # Engine position of the last start, origin of the track's bar grid
 
         self._sync_children: List[Track] = []
         self._sync_from: Optional[Track] = sync_from
@@ -47,7 +53,7 @@ class Track():
         self.transforms = []
 
 
-    def add(self, sequence: Union[str, Seq, Callable, Generator], *args, **kwargs) -> Track:
+    def add(self, sequence: Union[str, Seq, Callable, Generator], *args, at: Optional[float] = None, **kwargs) -> Track:
         """
             Add a sequence or a generator to this track.
         """
@@ -55,19 +61,25 @@ class Track():
         # if isinstance(sequence, str):
         #     sequence = parse(sequence)
         if callable(sequence) or isinstance(sequence, Generator):
-            return self._addGen(sequence, *args, **kwargs)
+            return self._addGen(sequence, *args, at=at, **kwargs)
         
-        self.seqs.append(sequence)
+        self._command("add", sequence, at=at)
         return self
 
 
-    def _addGen(self, func: Union[Generator, Callable], *args, **kwargs) -> Track:
+    def _addGen(self, func: Union[Generator, Callable], *args, at: Optional[float] = None, **kwargs) -> Track:
         """
             Add a sequence generator to this track.
             A callable should be provided, not the generator itself.
             When a callable is provided, the generator can be resetted.
         """
 
+        self._command("add", func, args, kwargs, at=at)
+        return self
+
+
+    def _register_gen(self, func: Union[Generator, Callable], args: tuple, kwargs: dict) -> int:
+        """Returns the id of the generator, to be added to the sequence list"""
         if isinstance(func, Generator):
             generator = func
         else:
@@ -79,29 +91,33 @@ class Track():
             "generator": generator,
             # "seqs": [],
             }
-        self.seqs.append(gen_id)
+        return gen_id
+
+
+    def swap(self, index: int, sequence: Union[str, Seq, Callable, Generator], *args, at: Optional[float] = None, **kwargs) -> Track:
+        """
+            Replace a sequence or a generator of this track.
+        """
+        self._command("swap", sequence, args, kwargs, index, at=at)
         return self
 
 
-    def delLast(self):
-        if self.seqs:
-            self.seqs = self.seqs[:-1]
+    def delLast(self, at: Optional[float] = None):
+        self._command("delete", -1, at=at)
 
     def delAdd(self, sequence: Union[str, Seq, Callable, Generator], *args, **kwargs) -> Track:
         if self.seqs:
-            self.seqs.pop()
+            return self.swap(-1, sequence, *args, **kwargs)
 
-        return self.add(sequence)
+        return self.add(sequence, *args, **kwargs)
 
 
     def clearAdd(self, sequence: Union[str, Seq, Callable, Generator], *args, **kwargs) -> Track:
-        self.clear()
+        self.clear(at=kwargs.get("at"))
         self.add(sequence, *args, **kwargs)
 
-    def clear(self):
-        self.seqs.clear()
-        self.generators.clear()
-        self.seq_i = 0
+    def clear(self, at: Optional[float] = None):
+        self._command("clear", at=at)
     
 
     def getParam(self, other: Track):
@@ -110,31 +126,109 @@ class Track():
         self.instrument = other.instrument
     
 
-    def start(self, loop:Optional[bool] = None):
-        self.reset()
-        self.stopped = False
-        if loop is not None:
-            self.loop = loop
+    def start(self, loop: Optional[bool] = None, at: Optional[float] = None):
+        """
+        Args:
+            at (float): Engine position the track starts at, in time units
+        """
+        self._command("start", loop, at=at)
     
-    def startSync(self, loop:Optional[bool] = None):
-        """Start this track synchronized with the currently playing tracks"""
-        raise NotImplementedError
+    def startSync(
+            self,
+            loop: Optional[bool] = None,
+            quantum: float = 2.0,
+            reference: Optional[Track] = None,
+            at: Optional[float] = None
+        ):
+        """
+        Start this track on the next bar (or beat) boundary,
+        so it stays in phase with the currently playing tracks
+
+        Args:
+            quantum (float): Grid step, in time units (a bar of 4 beats by default, 0.5 for a beat)
+            reference (Track): Track whose start defines the grid,
+                defaults to the position playback was started at
+            at (float): Start on the first boundary from this engine position
+        """
+        self._command("startSync", loop, quantum, reference, at=at)
 
 
-    def stop(self):
-        self.stopped = True
+    def stop(self, at: Optional[float] = None):
+        self._command("stop", at=at)
 
 
     def reset(self):
         self._next_timer = self.offset
+        self._fresh_start = True # Time starts flowing from the next update
         self.seq_i = 0
     
 
-    def mute(self):
-        self.muted = True
+    def mute(self, at: Optional[float] = None):
+        self._command("mute", True, at=at)
     
-    def unmute(self):
-        self.muted = False
+    def unmute(self, at: Optional[float] = None):
+        self._command("mute", False, at=at)
+
+
+    def _command(self, name: str, *args, at: Optional[float] = None) -> None:
+        """
+        Changes are applied by the IO thread when it is running,
+        so that tracks are never modified while being rendered
+        """
+        if env.commands.running:
+            env.commands.push(self, name, args, at)
+            env.wakeup.set()
+        else:
+            self._apply(name, args)
+
+
+    def _apply(self, name: str, args: tuple, delay: float = 0.0, position: float = 0.0) -> None:
+        """
+        Apply a command to this track
+
+        Args:
+            delay: Time left until the command target position, in time units
+            position: Current engine position, in time units
+        """
+        if name in ("add", "swap"):
+            sequence = args[0]
+            if callable(sequence) or isinstance(sequence, Generator):
+                sequence = self._register_gen(*args[:3])
+            if name == "add":
+                self.seqs.append(sequence)
+            else:
+                self.seqs[args[3]] = sequence
+        elif name == "delete":
+            if self.seqs:
+                del self.seqs[args[0]]
+        elif name == "clear":
+            self.seqs.clear()
+            self.generators.clear()
+            self.seq_i = 0
+        elif name == "start":
+            self._start(args[0], delay, position)
+        elif name == "startSync":
+            loop, quantum, reference = args
+            origin = env.play_origin if reference is None else reference._start_position
+            # Computed from absolute positions, so the track lands exactly on the grid
+            target = position + delay
+            target = origin + math.ceil((target - origin) / quantum - 1e-9) * quantum
+            self._start(loop, target - position, position)
+        elif name == "stop":
+            self.stopped = True
+        elif name == "mute":
+            self.muted = args[0]
+        else:
+            raise ValueError(f"Unknown track command '{name}'")
+
+
+    def _start(self, loop: Optional[bool] = None, delay: float = 0.0, position: float = 0.0) -> None:
+        self.reset()
+        self._next_timer += delay
+        self._start_position = position + delay
+        self.stopped = False
+        if loop is not None:
+            self.loop = loop
 
 
     def setGroup(self, track_group):
@@ -151,9 +245,12 @@ class Track():
         if other != None:
             other._sync_children.append(self)
     
-    def _sync(self) -> None:
+    def _sync(self, timer=0.0) -> None:
+        """Start this track aligned on its parent's timer"""
         if self.stopped:
-            self.start()
+            self._start(delay=timer)
+            # Bars are counted from the parent's grid
+            self._start_position = self._sync_from._start_position
     
 
     def _get_priority_list(self) -> List[Track]:
@@ -182,8 +279,16 @@ class Track():
         self.transforms.clear()
 
 
-    def update(self, timedelta) -> Optional[List[tuple]]:
-        """Returns MidiMessages when a new sequence just started"""
+    def update(self, timedelta, lookahead=0.0) -> Optional[List[tuple]]:
+        """
+        Returns MidiMessages when a new sequence is about to start
+
+        Args:
+            timedelta (float): Time elapsed since last update
+            lookahead (float): Render the next sequence when it is due within this time
+        
+        Message times are relative to the current time
+        """
 
         # TODO: allow looping for finished generators
 
@@ -195,12 +300,16 @@ class Track():
             return
         
         # Let time flow, until next event
-        self._next_timer -= timedelta
-        if self._next_timer > 0.0:
+        if self._fresh_start:
+            # Time spent before the track was started doesn't count
+            self._fresh_start = False
+        else:
+            self._next_timer -= timedelta
+        if self._next_timer > lookahead + 1e-9: # Ignore rounding errors
             return
         
         for t in self._sync_children:
-            t._sync()
+            t._sync(self._next_timer)
 
         if self.seq_i < len(self.seqs):
             # Send next sequence
@@ -225,7 +334,7 @@ class Track():
                     else:
                         # Skip
                         self.seq_i += 1
-                        return self.update(0.0)
+                        return self.update(0.0, lookahead)
                 # else:
                      # sequence index won't increment until generator finishes
                 #     self.seq_i -= 1
@@ -249,18 +358,17 @@ class Track():
                         except TypeError:
                             pass
 
-                messages = (sequence^self.transpose).getMidiMessages(self.channel)
+                # Message times are relative to the current time,
+                # MIDI messages don't need to be sorted at this point
+                messages = (sequence^self.transpose).getMidiMessages(self.channel, self._next_timer)
                 # Add midi modulation sequence
                 if sequence.modseq is not None:
-                    messages.extend(sequence.modseq.getMidiMessages(self.channel))
-
-                # MIDI messages don't need to be sorted at this point
-                messages = [ (t + self._next_timer, mess) for t, mess in messages ]
+                    messages.extend(sequence.modseq.getMidiMessages(self.channel, self._next_timer))
             
             if self.instrument and self.send_program_change:
                 program_change = [PROGRAM_CHANGE | self.channel, self.instrument]
                 # Make sure the instrument change precedes the notes
-                return [ (self._next_timer - 0.0001, program_change) ] + messages
+                messages.insert(0, (self._next_timer - 0.0001, program_change))
 
             self._next_timer += sequence.dur
             return messages
@@ -335,7 +443,8 @@ class TrackGroup:
 
     def _update_priority_list(self) -> None:
         # Build priority tree
-        self.priority_list: List[Track] = []
+        # The list is only assigned once complete, as the IO thread may be iterating it
+        priority_list: List[Track] = []
         top_priority = []
         for track in self.tracks:
             track._sync_children = []
@@ -349,9 +458,10 @@ class TrackGroup:
         
         # Build list from tree
         for track in top_priority:
-            self.priority_list.append(track)
+            priority_list.append(track)
             for children_track in track._sync_children:
-                self.priority_list.extend( children_track._get_priority_list() )
+                priority_list.extend( children_track._get_priority_list() )
+        self.priority_list = priority_list
     
 
     def __iter__(self):
@@ -361,4 +471,109 @@ class TrackGroup:
         return sorted(self.tracks, key=lambda t:t.name)[index]
 
 
+
+class TrackScheduler:
+    """
+    Wakes tracks only when their next sequence is due,
+    instead of updating every track on every cycle.
+
+    Running tracks are kept in a heap, by the engine position
+    at which they must render their next sequence.
+    Due tracks are updated in priority list order,
+    so parent tracks always come before their synchronized children.
+    """
+
+    def __init__(self, track_list: Optional[List[Track]] = None) -> None:
+        self._track_list: Optional[List[Track]] = None
+        self._order: Dict[Track, int] = dict() # Index in priority list
+        self._heap: List[Tuple[float, int, int, Track]] = [] # (position, order, count, track)
+        self._count = 0
+        self._due: Dict[Track, float] = dict() # Scheduled position, to skip outdated heap entries
+        self._last: Dict[Track, float] = dict() # Position of last update
+        if track_list is not None:
+            self.setTracks(track_list, 0.0)
+
+
+    def setTracks(self, track_list: List[Track], position: float) -> None:
+        """Set the priority list of tracks to update, running tracks are woken"""
+        if track_list is self._track_list:
+            return
+        self._track_list = track_list
+        self._order = { track: i for i, track in enumerate(track_list) }
+        self._heap.clear()
+        self._due.clear()
+        for track in track_list:
+            if not track.stopped:
+                self.wake(track, position)
+
+
+    def wake(self, track: Track, position: float) -> None:
+        """Update a track on the next cycle (after a change)"""
+        self._schedule(track, position)
+        self._last.setdefault(track, position)
+
+
+    def _schedule(self, track: Track, due: float) -> None:
+        if track not in self._order:
+            return
+        if self._due.get(track, math.inf) <= due:
+            return
+        self._due[track] = due
+        heapq.heappush(self._heap, (due, self._order[track], self._count, track))
+        self._count += 1
+
+
+    def nextDue(self) -> float:
+        """Position of the next track update"""
+        heap = self._heap
+        while heap and self._due.get(heap[0][3]) != heap[0][0]:
+            heapq.heappop(heap) # Outdated
+        return heap[0][0] if heap else math.inf
+
+
+    def due(self, position: float, lookahead=0.0) -> Iterator[Tuple[Track, float]]:
+        """
+        Iterate over due tracks, in priority order.
+        Every yielded track must be updated before the next one is yielded,
+        as it is rescheduled from its new timer.
+
+        Args:
+            position: Current engine position, in time units
+            lookahead: Sequences are rendered this long before they start
+
+        Yields:
+            Due tracks, with the time elapsed since their last update
+        """
+        # Due tracks, by priority
+        due: List[Tuple[int, Track]] = []
+        while self.nextDue() <= position:
+            _, order, _, track = heapq.heappop(self._heap)
+            del self._due[track]
+            heapq.heappush(due, (order, track))
+        queued = { track for _, track in due }
+        
+        while due:
+            _, track = heapq.heappop(due)
+            timedelta = position - self._last.get(track, position)
+            self._last[track] = position
+            yield track, timedelta
+
+            # Children started on their parent's timer are updated right away
+            for child in track._sync_children:
+                if child._fresh_start and not child.stopped and child in self._order:
+                    if child not in queued:
+                        queued.add(child)
+                        heapq.heappush(due, (self._order[child], child))
+
+            if not track.stopped:
+                self._schedule(track, position + max(track._next_timer - lookahead, 0.0))
+            
+    
+    def clear(self) -> None:
+        self._heap.clear()
+        self._due.clear()
+        self._last.clear()
+
+
+
 tracks = TrackGroup()
\ No newline at end of file
@@ -0,0 +1,46 @@
+from midiseq.backends import NullOutput, CaptureOutput, FileOutput, QueueInput
+from midiseq.engine import OutputPort, InputPort
+
+
+
+def test_output_backends(tmp_path):
+    port = OutputPort("bench", backend="null")
+    assert port.isOpen()
+    port.send([0x90, 60, 100])
+    port.send([0xC0, 5])
+    assert isinstance(port.port, NullOutput)
+    assert (port.port.messages, port.port.bytes) == (2, 5)
+
+    now = [1.0]
+    capture = CaptureOutput(timer=lambda: now[0])
+    port = OutputPort("capture", backend=capture)
+    port.push(0.5, [0x90, 60, 100])
+    port.process(0.25)
+    assert len(capture.sent) == 0
+    now[0] = 1.5
+    port.process(0.5)
+    assert list(capture.sent) == [(1.5, [0x90, 60, 100])]
+
+    path = tmp_path / "out.mid"
+    port = OutputPort(str(path), backend="file")
+    assert isinstance(port.port, FileOutput)
+    port.send([0x90, 60, 100])
+    port.send([0x80, 60, 0])
+    port.close()
+    assert path.read_bytes() == bytes([0x90, 60, 100, 0x80, 60, 0])
+
+
+def test_queue_input():
+    now = [0.0]
+    queue = QueueInput(timer=lambda: now[0])
+    port = InputPort("in", callback=False, backend=queue)
+    queue.feed([0x90, 60, 100])
+    now[0] = 0.5
+    queue.feed([0x80, 60, 0])
+    port.process()
+    assert list(port.events) == [(0.0, [0x90, 60, 100]), (0.5, [0x80, 60, 0])]
+    assert len(port.notes) == 1
+
+    port.setCallback(True)
+    queue.feed([0x90, 62, 100])
+    assert port._key_states.isActive(0, 62)
@@ -0,0 +1,46 @@
+from midiseq.bus import MidiBus, BusInput, Transform, getBus
+from midiseq.backends import CaptureOutput
+from midiseq.engine import OutputPort, InputPort
+
+
+
+def test_bus():
+    bus = MidiBus("test")
+    received = []
+    bus.subscribe(received.append)
+    message = [0x90, 60, 100]
+    bus.send_message(message)
+    assert received[0] is message # Not copied
+    bus.unsubscribe(received.append)
+    bus.send_message(message)
+    assert len(received) == 1 and len(bus) == 0
+
+    # Transformer, from a bus to another
+    octaves = MidiBus("octaves")
+    recorder = CaptureOutput(timer=lambda: 0.0)
+    octaves.subscribe(recorder.send_message)
+    bus.subscribe(Transform(lambda m: [m[0], m[1] + 12, m[2]] if m[0] & 0xf0 == 0x90 else None, octaves))
+    bus.send_message([0x90, 60, 100])
+    bus.send_message([0xB0, 1, 64])
+    assert list(recorder.sent) == [(0.0, [0x90, 72, 100])]
+
+    assert getBus("shared") is getBus("shared")
+
+
+def test_bus_ports():
+    # Loopback from an output port to a virtual input port
+    output_port = OutputPort("loop", backend="bus")
+    assert output_port.port is getBus("loop")
+    now = [0.0]
+    input_port = InputPort("loop", callback=False, backend=BusInput(getBus("loop"), lambda: now[0]))
+
+    output_port.transpose = 2
+    output_port.send([0x90, 60, 100])
+    now[0] = 0.5
+    output_port.send([0x80, 60, 0])
+    input_port.process()
+    assert list(input_port.events) == [(0.0, [0x90, 62, 100]), (0.5, [0x80, 62, 0])]
+    assert input_port.notes.notes[0][1].pitch == 62
+
+    input_port.close()
+    assert len(getBus("loop")) == 0
@@ -0,0 +1,31 @@
+import threading
+
+from midiseq.clock import Clock, VirtualClock
+
+
+
+def test_clock():
+    clock = Clock()
+    t0 = clock.now_ns()
+    clock.sleep(0.001)
+    assert clock.now_ns() - t0 >= 1_000_000
+    assert clock.wait(threading.Event(), 0.001) == False
+
+
+def test_virtual_clock():
+    clock = VirtualClock()
+    assert clock.now() == 0.0
+    clock.advance(0.5)
+    clock.sleep(0.25)
+    assert clock.now_ns() == 750_000_000
+
+    event = threading.Event()
+    assert clock.wait(event, 1.0) == False
+    assert clock.now() == 1.75
+    event.set()
+    assert clock.wait(event, 1.0) == True
+    assert clock.now() == 1.75
+
+    # Time always moves forward
+    clock.advance(1e-12)
+    assert clock.now_ns() == 1_750_000_001
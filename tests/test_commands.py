@@ -0,0 +1,56 @@
+from midiseq.commands import CommandQueue
+from midiseq.elements import Seq
+from midiseq.tracks import Track
+from midiseq import env as env
+
+
+
+def test_command_queue():
+    queue = CommandQueue()
+    t = Track(name="t")
+    queue.push(None, "bpm", (100,), at=2.0)
+    queue.push(t, "start", (None,), at=2.0)
+    queue.push(t, "mute", (True,))
+    queue.push(None, "stop")
+    assert len(queue) == 4
+
+    # Commands without target position come first, in order
+    assert [ c.name for c in queue.drain(0.0, lookahead=0.5) ] == ["mute", "stop"]
+    # Track commands are due 'lookahead' before their target position
+    assert queue.nextDue() == 1.5
+    assert [ c.name for c in queue.drain(1.6, lookahead=0.5) ] == ["start"]
+    assert queue.drain(1.9) == []
+    assert [ c.args for c in queue.drain(2.0) ] == [(100,)]
+    assert len(queue) == 0
+
+    # Playback starts with the tracks started at the same position
+    queue.push(None, "play", at=3.0)
+    queue.push(t, "start", (None,), at=3.0)
+    assert [ c.name for c in queue.drain(2.5, lookahead=0.5) ] == ["play", "start"]
+
+
+def test_track_commands():
+    env.note_dur = 1/8
+    t = Track(name="t")
+    # Applied directly when the IO thread isn't running
+    t.add(Seq("do re"))
+    t.delAdd(Seq("mi"))
+    assert len(t) == 1
+
+    t._apply("start", (None,), delay=0.5)
+    assert not t.stopped
+    assert t.update(0.0, 0.2) is None
+    messages = t.update(0.3, 0.2)
+    assert messages[0][0] == 0.2
+
+    # Commands are queued when the IO thread is running
+    env.commands.running = True
+    try:
+        t.mute()
+        assert not t.muted
+        for command in env.commands.drain(0.0):
+            command.target._apply(command.name, command.args)
+        assert t.muted
+    finally:
+        env.commands.running = False
+        env.commands.clear()
@@ -1,8 +1,122 @@
 from midiseq.engine import (
     listInputs, listOutputs,
-    getInput, getOutput
+    getInput, getOutput,
+    render,
+    OutputPort, setRealtime,
 )
+import midiseq.engine as engine
+from midiseq.tempomap import TempoMap
+from midiseq.elements import Seq
+from midiseq.tracks import Track
 from midiseq import env as env
 
 
 # def test_inputs_outputs():
+
+
+def test_render():
+    env.note_dur = 1/8
+    env.bpm = 120
+    t1 = Track(name="t1")
+    t2 = Track(channel=1, name="t2", sync_from=t1)
+    t1.add(Seq("do re mi fa"))
+    t2.add(Seq("sol"))
+    t1.loop = True
+
+    events = render(t1, 2.0)
+    # t1 plays 4 loops of 4 notes, t2 is restarted on every loop
+    assert len(events) == 2 * 4 * (4 + 1)
+    assert events == sorted(events, key=lambda e: e[0])
+    assert events[-1][0] == 2.0 # Last note-off
+    assert t1.stopped and t2.stopped
+
+    # Rendering is deterministic
+    onsets = [ t for t, mess, _ in events if mess[0] == 0x90 ]
+    assert onsets[:5] == [0.0, 0.125, 0.25, 0.375, 0.5]
+
+    # Tempo halved from position 1.0
+    tempo_map = TempoMap(120)
+    tempo_map.setTempo(1.0, 60)
+    events = render(t1, 2.0, tempo_map=tempo_map)
+    onsets = [ t for t, mess, _ in events if mess[0] == 0x90 ]
+    assert onsets[7:10] == [0.875, 1.0, 1.25]
+    assert events[-1][0] == 3.0
+
+
+def test_input_callback():
+    port = getInput("kbd", callback=True, backend="null")
+    assert port.callback
+    forwarded = []
+    class ThruPort:
+        def send(self, event):
+            forwarded.append(event)
+    port.forward_ports.append(ThruPort())
+
+    port._callback( ([0x90, 60, 100], 0.0) )
+    assert port._key_states.isActive(0, 60)
+    port._callback( ([0x80, 60, 0], 0.5) )
+    # Thru and key states are handled right away
+    assert len(forwarded) == 2
+    assert not port._key_states.isActive(0, 60)
+    assert len(port.events) == 0
+
+    port.process()
+    assert len(port.events) == 2
+    assert len(port.notes) == 1
+    assert port.notes.notes[0][1].dur == 0.5
+
+    port.forward_ports.clear()
+    port.setCallback(False)
+    port.clear()
+
+
+def test_realtime():
+    import gc
+    port = OutputPort("realtime", backend="null")
+    setRealtime(True)
+    try:
+        engine._suspend_gc()
+        assert not gc.isenabled() and gc.get_freeze_count() > 0
+        # Nothing is collected again while suspended
+        collections = gc.get_stats()[2]["collections"]
+        engine._suspend_gc()
+        assert gc.get_stats()[2]["collections"] == collections
+        port.pushMany([ (0.1, [0x90, 60, 100]), (0.2, [0x80, 60, 0]), (0.5, [0xC0, 3]) ])
+        # Sent from reused buffers
+        port.process(0.3)
+        assert port.port.messages == 2 and port.port.bytes == 6
+        assert len(port.events) == 1
+        engine._collect_young()
+    finally:
+        setRealtime(False)
+    assert gc.isenabled() and gc.get_freeze_count() == 0
+
+
+def test_remote_port():
+    class FakeRemote:
+        def __init__(self):
+            self.pushed = []
+        def push(self, index, t, message, wake=True):
+            self.pushed.append(message)
+        def wake(self):
+            pass
+    remote = FakeRemote()
+    engine._remote = remote
+    port = OutputPort("remote", backend="null")
+    port._remote_index = 0
+    try:
+        port.filter_redundant = True
+        port.captured = []
+        port.pushMany([ (0.5, [0xB0, 7, 100]), (0.2, [0xB0, 7, 100]) ])
+        port.transpose = 12
+        port.pushMany([ (0.5, [0x80, 60, 0]), (0.0, [0x90, 60, 100]) ])
+        # Filtered and transposed when pushed, in time order
+        assert remote.pushed == [[0xB0, 7, 100], [0x90, 72, 100], [0x80, 72, 0]]
+        assert [ t for t, _ in port.captured ] == [0.2, 0.0, 0.5]
+        assert not port._key_states.isActive(0, 72)
+        # Clock ticks go through the remote process too
+        port._send_realtime([0xF8])
+        assert remote.pushed[-1] == [0xF8]
+    finally:
+        port._remote_index = None
+        engine._remote = None
@@ -0,0 +1,74 @@
+from midiseq.eventqueue import EventQueue
+
+
+
+def test_event_queue():
+    queue = EventQueue()
+    queue.pushMany([ (t * 0.1, [0xB0, 1, t]) for t in range(10, 0, -1) ])
+    queue.pushMany([ (0.25, [0x90, 60, 100]), (0.75, [0x80, 60, 0]) ])
+    queue.push(0.0, [0xC0, 3])
+    queue.pushMany([])
+    assert len(queue) == 13
+    assert queue.nextTime() == 0.0
+
+    times = [ t for t, _ in queue ]
+    assert times == sorted(times)
+
+    assert [ e for _, e in queue.popUntil(0.25) ] == [
+        [0xC0, 3], [0xB0, 1, 1], [0xB0, 1, 2], [0x90, 60, 100]
+    ]
+    assert len(queue) == 9
+    assert queue.nextTime() == 0.30000000000000004
+
+    popped = [ queue.pop()[0] for _ in range(len(queue)) ]
+    assert popped == sorted(popped)
+    assert not queue
+    queue.push(1.0, [0xF8])
+    queue.clear()
+    assert len(queue) == 0 and queue.nextTime() == float("inf")
+
+
+def test_event_order():
+    queue = EventQueue()
+    queue.pushMany([
+        (1.0, [0x90, 60, 100]),
+        (1.0, [0xB0, 1, 64]),
+        (1.0, [0x90, 62, 0]), # Note-off as a zero velocity note-on
+        (1.0, [0x80, 60, 0]),
+        (1.0, [0x90, 64, 100]),
+    ])
+    queue.push(0.5, [0xF8])
+    # Note-offs first, then by insertion order
+    assert [ queue.pop()[1] for _ in range(6) ] == [
+        [0xF8], [0x90, 62, 0], [0x80, 60, 0], [0xB0, 1, 64], [0x90, 60, 100], [0x90, 64, 100]
+    ]
+    # Ties across batches are kept in insertion order,
+    # also when pending runs are numbered again
+    queue.pushMany([ (2.0, [0xB0, 1, 0]), (2.0, [0xB0, 1, 1]) ])
+    for i in range(1 << 16):
+        queue.pushMany([ (0.0, [0xF8]) ])
+        queue.pop()
+    queue.pushMany([ (2.0, [0xB0, 1, 2]), (2.0, [0xB0, 1, 3]) ])
+    queue.push(2.0, [0xB0, 1, 4])
+    assert len(queue._runs) == 3
+    assert [ queue.pop()[1][2] for _ in range(5) ] == [0, 1, 2, 3, 4]
+
+    # Large batches are split into runs
+    events = [ (i * 0.001, [0xB0, 1, i & 0x7f]) for i in range(10000) ]
+    queue.pushMany(events[::-1])
+    assert len(queue) == 10000
+    assert [ e for e in queue ] == events
+    assert [ queue.pop() for _ in range(10000) ] == events
+
+
+def test_pop_into():
+    queue = EventQueue()
+    queue.pushMany([ (0.5, [0xC0, 3]), (0.2, [0x80, 60, 0]), (0.1, [0x90, 60, 100]) ], offset=1.0)
+    buffers = [[], [0], [0, 0], [0, 0, 0]]
+    assert queue.popInto(1.0, buffers) is None
+    message = queue.popInto(1.2, buffers)
+    assert message is buffers[3] and message == [0x90, 60, 100] and queue.popped_time == 1.1
+    assert queue.popInto(1.2, buffers) == [0x80, 60, 0]
+    assert queue.popInto(1.2, buffers) is None
+    assert queue.popInto(2.0, buffers) is buffers[2] == [0xC0, 3]
+    assert not queue
@@ -0,0 +1,27 @@
+import sys
+import subprocess
+
+
+
+def test_import_side_effects():
+    script = (
+        "import midiseq, midiseq.engine\n"
+        "assert not midiseq.engine._midiout_ports\n"
+        "assert 'seq_kaini_industries' not in vars(midiseq.seqs)\n"
+        "assert midiseq.seq_kaini_industries.dur == 8.0\n"
+        "assert 'seq_kaini_industries' in vars(midiseq.seqs)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
+
+
+def test_star_import():
+    script = (
+        "from midiseq import *\n"
+        "assert seq_kaini_industries.dur == 8.0\n"
+        "assert isinstance(seq_freya_theme, Seq)\n"
+        "assert callable(play) and t1 is env.default_track\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,49 @@
+from midiseq.keystates import KeyStates, ChannelStates
+
+
+
+def test_key_states():
+    states = KeyStates()
+    states.update(0.0, [0x90, 60, 100])
+    states.update(0.5, [0x91, 64, 80])
+    states.update(0.5, [0xB0, 1, 64]) # Ignored
+    assert len(states) == 2
+    assert states.isActive(1, 64)
+
+    # Released notes are returned with their onset time and velocity
+    assert states.update(1.0, [0x80, 60, 0]) == (60, 0.0, 100)
+    assert states.update(1.0, [0x80, 60, 0]) is None
+    states.update(1.5, [0x90, 62, 90])
+    assert states.update(2.0, [0x90, 62, 0]) == (62, 1.5, 90)
+
+    assert sorted(states.activeNotes()) == [(1, 64)]
+    assert list(states.release()) == [(1, 64)]
+    assert len(states) == 0 and states.velocities[(1 << 7) | 64] == 0
+
+
+def test_channel_states():
+    states = ChannelStates()
+    assert states.update([0xC0, 5])
+    assert not states.update([0xC0, 5])
+    assert states.update([0xC1, 5]) # Other channel
+
+    assert states.update([0xB0, 7, 100])
+    assert not states.update([0xB0, 7, 100])
+    assert states.update([0xB0, 7, 101])
+    assert states.update([0xB0, 6, 1]) and states.update([0xB0, 6, 1]) # Data entry
+
+    # Bank select needs the program change to be sent again
+    assert states.update([0xB0, 0, 1])
+    assert states.update([0xC0, 5])
+
+    assert states.update([0xE0, 0, 64])
+    assert not states.update([0xE0, 0, 64])
+    assert states.update([0xD0, 10]) and not states.update([0xD0, 10])
+    assert states.update([0xA0, 60, 10]) and not states.update([0xA0, 60, 10])
+    assert states.update([0x90, 60, 100]) and states.update([0x90, 60, 100])
+
+    # Reset all controllers
+    assert states.update([0xB0, 121, 0])
+    assert states.update([0xB0, 7, 101])
+    assert states.update([0xE0, 0, 64])
+    assert not states.update([0xC0, 5])
@@ -0,0 +1,52 @@
+import time
+import random
+
+from midiseq.clock import Clock
+from midiseq.midiclock import MidiClock, ClockFollower, TICK
+
+
+
+def test_midi_clock():
+    clock = Clock()
+    sent = []
+    # 1 time unit per second (120 bpm)
+    midi_clock = MidiClock(sent.append, lambda position: position, lambda: clock)
+    midi_clock.start(clock.now() + 0.02)
+    time.sleep(0.02 + 10.5 * TICK)
+    midi_clock.stop()
+    time.sleep(0.02)
+    midi_clock.close()
+
+    assert sent[0] == [0xFA]
+    assert sent[-1] == [0xFC]
+    assert 9 <= sent.count([0xF8]) <= 12
+    assert midi_clock.jitter.count == sent.count([0xF8])
+
+    # Song position pointer and continue
+    sent.clear()
+    midi_clock = MidiClock(sent.append, lambda position: position, lambda: clock)
+    midi_clock.start(clock.now() + 1.0, song_position=200)
+    time.sleep(0.02)
+    midi_clock.close()
+    assert sent == [[0xF2, 200 & 0x7f, 200 >> 7], [0xFB], [0xFC]]
+
+
+
+def test_clock_follower():
+    rnd = random.Random(0)
+    follower = ClockFollower(bpm=120)
+    period = 60 / (100 * 24) # Incoming clock at 100 bpm
+    filtered = []
+    for i in range(24 * 32):
+        # Up to 1ms of jitter on every tick
+        t = i * period + rnd.uniform(-0.001, 0.001)
+        filtered.append(follower.tick(t) - i * period)
+    
+    assert follower.ticks == 24 * 32
+    assert abs(follower.bpm - 100) < 0.5
+    # Filtered tick times have less jitter than received ones
+    assert max(abs(e) for e in filtered[-24 * 8:]) < 0.001
+
+    follower.reset()
+    assert follower.ticks == 0
+    assert follower.tick(100.0) == 100.0
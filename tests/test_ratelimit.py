@@ -0,0 +1,65 @@
+from midiseq.ratelimit import RateLimiter
+
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(300, burst=6) # 100 messages per second
+    assert limiter.allow([0xB0, 1, 0], 0.0)
+    assert limiter.allow([0xB0, 1, 1], 0.0)
+    # Over budget, controller values are delayed and thinned
+    assert not limiter.allow([0xB0, 1, 2], 0.0)
+    assert not limiter.allow([0xB0, 2, 0], 0.0)
+    assert not limiter.allow([0xB0, 1, 3], 0.0)
+    assert len(limiter) == 2 and limiter.dropped == 1
+    # Notes are never delayed
+    assert limiter.allow([0x90, 60, 100], 0.0)
+    assert limiter.tokens == -3
+
+    assert list(limiter.due(0.01)) == []
+    assert abs(limiter.wait(0.01) - 0.01) < 1e-9
+    assert list(limiter.due(0.02)) == [[0xB0, 1, 3]]
+    assert list(limiter.due(0.035)) == [[0xB0, 2, 0]]
+    assert limiter.delayed == 2
+    assert limiter.wait(0.035) == float("inf")
+
+
+def test_rate_limiter_order():
+    limiter = RateLimiter(300, burst=6)
+    assert limiter.allow([0xB0, 1, 0], 0.0) and limiter.allow([0xB0, 1, 1], 0.0)
+    assert not limiter.allow([0xB1, 7, 100], 0.0)
+    assert not limiter.allow([0xC0, 5], 0.0)
+    # Delayed messages of the note channel go first
+    note = [0x90, 60, 100]
+    assert limiter.before(note, 0.0) == [[0xC0, 5]]
+    assert limiter.allow(note, 0.0)
+    assert limiter.before(note, 0.0) == []
+    assert limiter.clear() == [[0xB1, 7, 100]]
+
+
+def test_port_bandwidth():
+    from midiseq.engine import OutputPort
+    port = OutputPort("limited", backend="capture")
+    port.setBandwidth(300, burst=3)
+    port.filter_redundant = True
+    port.send([0xB0, 1, 0])
+    port.send([0xB0, 1, 1])
+    port.send([0xC0, 5])
+    port.send([0x90, 60, 100])
+    # The program change isn't sent after the note
+    assert [ m for _, m in port.port.sent ] == [[0xB0, 1, 0], [0xB0, 1, 1], [0xC0, 5], [0x90, 60, 100]]
+
+    # Dropped delayed messages aren't considered sent
+    port.send([0xB0, 7, 99])
+    assert len(port.limiter) == 1
+    port.cancel()
+    port.send([0xB0, 7, 99])
+    assert port.filtered == 0
+
+    # The global budget isn't applied to offline (render) ports
+    from midiseq.engine import setBandwidth
+    setBandwidth(300)
+    try:
+        assert OutputPort("limited 2", backend="capture").limiter is not None
+        assert OutputPort(None).limiter is None
+    finally:
+        setBandwidth(None)
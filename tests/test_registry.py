@@ -0,0 +1,42 @@
+from midiseq.registry import PortRegistry, portKey
+
+
+
+def test_registry():
+    outputs = ["Midi Through 14:0", "Synth 24:0"]
+    inputs = ["Keyboard 20:0"]
+    calls = [0]
+    def lister():
+        calls[0] += 1
+        return list(outputs), list(inputs)
+
+    registry = PortRegistry(lister)
+    assert registry.find("output", "synth") == "Synth 24:0"
+    assert registry.find("output", 0) == "Midi Through 14:0"
+    assert registry.find("input", "key") == "Keyboard 20:0"
+    assert registry.find("output", "synth") == "Synth 24:0"
+    assert calls[0] == 1 # Enumerated once
+
+    changes = []
+    registry.addListener(lambda added, removed: changes.append((added, removed)))
+
+    # Unplugged
+    outputs.remove("Synth 24:0")
+    assert registry.refresh() == ([], [("output", "Synth 24:0")])
+    assert registry.refresh() == ([], [])
+    assert len(changes) == 1
+
+    # Plugged in again, found without an explicit refresh
+    outputs.append("Synth 28:0")
+    assert registry.find("output", "synth") == "Synth 28:0"
+    assert changes[-1] == ([("output", "Synth 28:0")], [])
+    assert registry.find("output", "nothing") is None
+    assert registry.find("output", 5) is None
+
+
+def test_port_key():
+    assert portKey("Synth 24:0") == portKey("Synth 28:0") == "Synth"
+    assert portKey("FLUID Synth (1234):Synth input port (1234:0) 128:0") == \
+        "FLUID Synth (1234):Synth input port (1234:0)"
+    assert portKey("Synth 2") == "Synth"
+    assert portKey("Virtual port") == "Virtual port"
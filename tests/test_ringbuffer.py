@@ -0,0 +1,54 @@
+from midiseq.ringbuffer import EventRing, SharedRing
+
+
+
+def test_ring():
+    ring = EventRing(capacity=4)
+    for i in range(6):
+        ring.append(i * 0.5, [0x90, 60 + i, 100])
+    assert len(ring) == 4
+    assert ring.count == 6
+    assert ring[0] == (1.0, [0x90, 62, 100])
+    assert ring[-1] == (2.5, [0x90, 65, 100])
+    assert [ t for t, _ in ring ] == [1.0, 1.5, 2.0, 2.5]
+
+    # Messages shorter than 3 bytes
+    ring.append(3.0, [0xC0, 12])
+    ring.append(3.5, [0xF8])
+    assert ring[-2][1] == [0xC0, 12]
+    assert ring[-1][1] == [0xF8]
+
+    ring.clear()
+    assert len(ring) == 0
+    assert list(ring) == []
+
+
+def test_ring_spill(tmp_path):
+    filename = str(tmp_path / "events.bin")
+    ring = EventRing(capacity=2, spill=filename)
+    for i in range(5):
+        ring.append(float(i), [0x90, i, 100])
+    ring.close()
+
+    events = list(EventRing.load(filename))
+    assert events == [ (float(i), [0x90, i, 100]) for i in range(5) ]
+
+
+def test_shared_ring():
+    ring = SharedRing(4)
+    other = SharedRing(4, name=ring.name)
+    for i in range(5):
+        ring.put(float(i), EventRing.pack([0x90, 60 + i, 100]))
+    assert ring.counts() == (4, 0)
+    records = other.get()
+    assert [ t for t, _ in records ] == [0.0, 1.0, 2.0, 3.0]
+    assert EventRing.unpack(records[0][1]) == [0x90, 60, 100]
+    assert other.get() == []
+
+    ring.put(4.0, 0)
+    ring.put(5.0, 0)
+    other.discard(5)
+    assert ring.counts() == (6, 5)
+    assert [ t for t, _ in other.get() ] == [5.0]
+    other.close()
+    ring.close(unlink=True)
@@ -0,0 +1,35 @@
+from midiseq.stats import Histogram, TimingStats
+from midiseq.tracks import Track
+
+
+
+def test_histogram():
+    h = Histogram(size=100)
+    for i in range(1, 201):
+        h.add(i / 1000)
+    assert h.count == 200
+    assert len(h.values) == 100 # Rolling window
+    summary = h.summary()
+    assert summary["max"] == 200.0
+    assert summary["p50"] == 151.0
+    assert summary["p99"] == 200.0
+
+
+def test_timing_stats():
+    stats = TimingStats(log_size=2)
+    stats.message("port", 1.0, 1.002, [144, 60, 100])
+    stats.message("port", 2.0, 2.001, [128, 60, 0])
+    stats.message("port", 3.0, 3.0, [144, 62, 100])
+    assert len(stats.log) == 2
+    assert stats.log[-1] == (3.0, 3.0, "port", [144, 62, 100])
+
+    stats.track(Track(name="t1"), 0.001)
+    stats.queue("port", 12)
+    summary = stats.summary()
+    assert summary["latency"]["count"] == 3
+    assert summary["tracks"]["t1"]["count"] == 1
+    assert summary["queues"]["port"]["max"] == 12
+
+    stats.clear()
+    assert stats.summary()["latency"]["count"] == 0
+    assert len(stats.log) == 0
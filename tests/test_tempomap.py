@@ -0,0 +1,75 @@
+import math
+
+from midiseq.tempomap import TempoMap
+
+
+
+def test_constant_tempo():
+    tempo_map = TempoMap(60, t=1.0, position=2.0)
+    assert tempo_map.timeAt(2.0) == 1.0
+    assert tempo_map.timeAt(3.0) == 3.0
+    assert tempo_map.positionAt(3.0) == 3.0
+    assert tempo_map.positionAt(0.0) == 1.5 # Before the anchor
+    assert len(tempo_map) == 1
+
+
+def test_tempo_changes():
+    tempo_map = TempoMap(120)
+    tempo_map.setTempo(8.0, 60)
+    tempo_map.setTempo(4.0, 240) # Later changes are kept
+    assert tempo_map.timeAt(4.0) == 4.0
+    assert tempo_map.timeAt(8.0) == 6.0
+    assert tempo_map.timeAt(9.0) == 8.0
+    assert tempo_map.bpmAt(5.0) == 240
+    assert tempo_map.nextChange(5.0) == 8.0
+    assert tempo_map.nextChange(8.0) == math.inf
+
+    # Replaced change
+    tempo_map.setTempo(8.0, 120)
+    assert tempo_map.timeAt(9.0) == 7.0
+
+
+def test_ramp():
+    tempo_map = TempoMap(120)
+    tempo_map.setTempo(2.0, 60, ramp=2.0)
+    # Tempo goes linearly from 120 to 60 between positions 2 and 4
+    assert tempo_map.bpmAt(3.0) == 90
+    assert tempo_map.bpmAt(5.0) == 60
+    expected = 2.0 + 4 * math.log(2) # Integral of 120 / (120 - 30 * x)
+    assert math.isclose(tempo_map.timeAt(4.0), expected)
+    assert math.isclose(tempo_map.timeAt(5.0), expected + 2.0)
+
+    # Numerical integration agrees
+    n = 10000
+    t = 2.0 + sum(120 / tempo_map.bpmAt(2.0 + (i + 0.5) / n) / n for i in range(n))
+    assert math.isclose(tempo_map.timeAt(3.0), t, rel_tol=1e-7)
+
+    # Conversions are the inverse of each other
+    for i in range(60):
+        p = i / 10
+        assert math.isclose(tempo_map.positionAt(tempo_map.timeAt(p)), p, abs_tol=1e-9)
+
+    # Interrupted ramp
+    tempo_map.setTempo(3.0, 150)
+    assert tempo_map.bpmAt(3.5) == 150
+    assert math.isclose(tempo_map.timeAt(4.0), tempo_map.timeAt(3.0) + 0.8)
+
+
+def test_trim():
+    tempo_map = TempoMap(120)
+    tempo_map.setTempo(2.0, 60, ramp=2.0)
+    tempo_map.setTempo(6.0, 120)
+    t = tempo_map.timeAt(7.0)
+    tempo_map.trim(5.0)
+    assert len(tempo_map) == 2
+    assert tempo_map.timeAt(7.0) == t
+
+
+def test_move_anchor():
+    tempo_map = TempoMap(120)
+    tempo_map.setTempo(2.0, 60)
+    tempo_map.moveAnchor(10.0, 0.0, 240)
+    # Changes after the new anchor are kept
+    assert tempo_map.bpmAt(1.0) == 240
+    assert tempo_map.timeAt(2.0) == 11.0
+    assert tempo_map.bpmAt(3.0) == 60
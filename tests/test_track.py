@@ -1,6 +1,6 @@
 
 from midiseq.elements import Seq
-from midiseq.tracks import Track, TrackGroup
+from midiseq.tracks import Track, TrackGroup, TrackScheduler
 from midiseq.utils import rnd
 from midiseq import env as env
 
@@ -53,4 +53,98 @@ def test_track_modifiers():
     m = t.update(0.0)
 
     t.pop()
-    assert len(t.transforms) == 0
\ No newline at end of file
+    assert len(t.transforms) == 0
+
+def test_sync_children():
+    env.note_dur = 1/8
+    t1 = Track(name="t1")
+    t2 = Track(name="t2", sync_from=t1)
+    t1.add(Seq("do re"))
+    t2.add(Seq("mi"))
+
+    t1.start()
+    t1.update(0.3) # Time spent before start doesn't count
+    assert t1._next_timer == 0.25
+    t2.stop()
+    
+    t1.update(0.26)
+    # Child track is started on its parent's timer
+    data = t2.update(0.26)
+    assert abs(data[0][0] - (-0.01)) < 1e-9
+
+
+def test_lookahead():
+    env.note_dur = 1/8
+    t = Track()
+    t.add(Seq("do re"))
+    t.add(Seq("mi"))
+    t.start()
+    assert len(t.update(0.0, 0.1)) == 4
+    assert t.update(0.1, 0.1) == None
+    
+    # Next sequence is rendered ahead of time
+    data = t.update(0.06, 0.1)
+    assert len(data) == 2
+    assert abs(data[0][0] - 0.09) < 1e-9
+
+
+def test_scheduler():
+    env.note_dur = 1/8
+    parent = Track(name="parent")
+    child = Track(name="child", sync_from=parent)
+    idle = [ Track(name=f"idle{i}") for i in range(100) ]
+    parent.add(Seq("do re mi fa")) # 0.5 units long
+    child.add(Seq("sol"))
+    for t in idle:
+        t.add(Seq("do", dur=8.0))
+    group = TrackGroup()
+    group.add_track(parent)
+    for t in idle:
+        group.add_track(t)
+    for t in [parent] + idle:
+        t.start()
+
+    scheduler = TrackScheduler(group.priority_list)
+    updated = [ t.update(dt) and t for t, dt in scheduler.due(0.0) ]
+    # Parent comes before the child it starts
+    assert updated.index(parent) < updated.index(child)
+    assert len(updated) == 102
+    assert scheduler.nextDue() == 0.125 # Child sequence end
+
+    # Only due tracks are woken
+    assert [ t for t, _ in scheduler.due(0.1) ] == []
+    assert [ t.update(dt) or t for t, dt in scheduler.due(0.125) ] == [child]
+    assert child.stopped
+    assert scheduler.nextDue() == 0.5
+    woken = []
+    for t, dt in scheduler.due(0.5):
+        assert t is child or dt == 0.5
+        t.update(dt)
+        woken.append(t)
+    assert woken == [parent, child]
+
+
+def test_start_sync():
+    env.note_dur = 1/8
+    env.play_origin = 0.0
+    drums = Track(name="drums")
+    bass = Track(name="bass")
+    drums.add(Seq("do re mi fa"))
+    bass.add(Seq("sol"))
+    drums.loop = True
+    drums._apply("start", (None,), 0.25, 1.0)
+    assert drums._start_position == 1.25
+
+    # Launched at position 2.3, on the next bar of the drums track
+    bass._apply("startSync", (None, 2.0, drums), 0.0, 2.3)
+    assert not bass.stopped
+    assert bass._start_position == 3.25
+    messages = bass.update(0.0, lookahead=1.0)
+    assert messages[0][0] == 3.25 - 2.3
+
+    # Next beat of the global grid
+    bass._apply("startSync", (None, 0.5, None), 0.0, 2.3)
+    assert bass._start_position == 2.5
+    # Already on the grid
+    bass._apply("startSync", (None, 0.5, None), 0.0, 3.0)
+    assert bass._start_position == 3.0